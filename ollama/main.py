@@ -1,16 +1,25 @@
 import asyncio
+import contextlib
+import json
 import logging
 import os
 import sys
+import time
 import uuid
-from typing import Dict
+from collections import OrderedDict, deque
+from typing import Dict, List, Union
 
-import requests
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import httpx
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from langchain_mistralai import ChatMistralAI
 from langchain_ollama import ChatOllama
 from pydantic import BaseModel
+from response_cache import ResponseCache
+from scheduler import BACKGROUND, INTERACTIVE, ModelScheduler
+from sessions import ChatSession, SessionStore
+from story_store import create_story_store
 
 logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
 log = logging.getLogger(__name__)
@@ -33,6 +42,30 @@ class Chat(BaseModel):
     prompt: str
     model: str
     stream: bool
+    temperature: float = 0
+    # Answer repeated prompts from the response cache, only for deterministic handlers.
+    cache: bool = False
+    # With the "auto" model, also ask the cloud when the local model is slow to answer.
+    hedge: bool = False
+
+
+class SessionCreate(BaseModel):
+    model: str = ""
+    # Defaults to the chat system prompt.
+    system: str = ""
+    temperature: float = 0
+
+
+class SessionMessage(BaseModel):
+    prompt: str
+    stream: bool = False
+
+
+class Warmup(BaseModel):
+    # Defaults to the WARMUP_MODELS.
+    models: List[str] = []
+    # Defaults to the model keep-alive policy, a duration ("10m") or seconds (-1 forever).
+    keep_alive: Union[int, str] = ""
 
 
 class Story(BaseModel):
@@ -40,6 +73,8 @@ class Story(BaseModel):
     model: str = ""
     stream: bool = False
     chapter_count: int = 3
+    # Start polishing chapters while the outline is still being generated.
+    incremental: bool = True
 
 
 def read_secret(name):
@@ -49,11 +84,166 @@ def read_secret(name):
 
 BASE_URL = "http://ollama:11434"
 
-current_model = "llama3.2"
-llm_handler = ChatOllama(
-    model=current_model, base_url=BASE_URL, temperature=0, timeout=300
+# Shared client for the direct calls to the Ollama API.
+ollama_client = httpx.AsyncClient(base_url=BASE_URL, timeout=30)
+
+DEFAULT_MODEL = os.getenv("OLLAMA_DEFAULT_MODEL", "llama3.2")
+LLM_HANDLERS_MAX = int(os.getenv("LLM_HANDLERS_MAX", "8"))
+OLLAMA_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_KEEPALIVE_CONNECTIONS", "8"))
+
+
+def keep_alive_value(keep_alive):
+    """
+    Ollama parses a keep_alive string as a duration ("5m"), plain numbers of seconds
+    like -1 (forever) must be sent as numbers.
+    """
+    for number in (int, float):
+        try:
+            return number(keep_alive)
+        except (TypeError, ValueError):
+            pass
+    return keep_alive
+
+
+def parse_keep_alive_policies(policies: str):
+    """
+    Parse `model=keep_alive` pairs, ex: "llama3.2=-1,deepseek-llm:7b-chat-q8_0=2m".
+    """
+    return {
+        model.strip(): keep_alive_value(keep_alive.strip())
+        for model, keep_alive in (
+            policy.split("=", 1) for policy in policies.split(",") if "=" in policy
+        )
+    }
+
+
+class KeepAlivePolicy:
+    """
+    How long Ollama keeps each model loaded after a request.
+    Models with an explicit policy use it, frequently used ones stay resident
+    longer and the others get the default, shorter, keep-alive.
+    """
+
+    def __init__(
+        self,
+        policies: dict,
+        default: str = "5m",
+        hot: str = "1h",
+        hot_requests: int = 5,
+        hot_window: float = 3600,
+    ):
+        self.policies = policies
+        self.default = default
+        self.hot = hot
+        self.hot_requests = hot_requests
+        self.hot_window = hot_window
+        self.usage = {}
+
+    def touch(self, model: str):
+        usage = self.usage.setdefault(model, deque())
+        usage.append(time.monotonic())
+        self._trim(usage)
+
+    def _trim(self, usage: deque):
+        while usage and time.monotonic() - usage[0] > self.hot_window:
+            usage.popleft()
+
+    def is_hot(self, model: str) -> bool:
+        usage = self.usage.get(model)
+        if not usage:
+            return False
+        self._trim(usage)
+        return len(usage) >= self.hot_requests
+
+    def keep_alive(self, model: str) -> Union[int, float, str]:
+        if model in self.policies:
+            return self.policies[model]
+        return self.hot if self.is_hot(model) else self.default
+
+
+keep_alive_policy = KeepAlivePolicy(
+    parse_keep_alive_policies(os.getenv("OLLAMA_KEEP_ALIVE_POLICIES", "")),
+    default=keep_alive_value(os.getenv("OLLAMA_KEEP_ALIVE_DEFAULT", "5m")),
+    hot=keep_alive_value(os.getenv("OLLAMA_KEEP_ALIVE_HOT", "1h")),
+    hot_requests=int(os.getenv("OLLAMA_HOT_REQUESTS", "5")),
+    hot_window=float(os.getenv("OLLAMA_HOT_WINDOW", "3600")),
 )
 
+
+class LLMHandlerRegistry:
+    """
+    Bounded LRU registry of Ollama chat handlers keyed by (model, temperature, timeout).
+    Each handler keeps its own keep-alive connection pool to Ollama, reused across requests.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.handlers: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model: str, temperature: float = 0, timeout: int = 300):
+        # Bounded to Ollama's useful range with one decimal, so free-form temperatures
+        # do not each create a handler and its connection pool.
+        temperature = round(min(max(temperature, 0), 2), 1)
+        key = (model, temperature, timeout)
+        handler = self.handlers.get(key)
+        if handler is not None:
+            self.hits += 1
+            self.handlers.move_to_end(key)
+            handler.keep_alive = keep_alive_policy.keep_alive(model)
+            return handler
+
+        self.misses += 1
+        log.info(f"Creating llm handler for {key}")
+        handler = ChatOllama(
+            model=model,
+            base_url=BASE_URL,
+            temperature=temperature,
+            timeout=timeout,
+            keep_alive=keep_alive_policy.keep_alive(model),
+            client_kwargs={
+                "timeout": timeout,
+                "limits": httpx.Limits(
+                    max_keepalive_connections=OLLAMA_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=300,
+                ),
+            },
+        )
+        self.handlers[key] = handler
+        if len(self.handlers) > self.max_size:
+            evicted, evicted_handler = self.handlers.popitem(last=False)
+            self.evictions += 1
+            log.info(f"Evicted llm handler for {evicted}")
+            self.close(evicted_handler)
+        return handler
+
+    @staticmethod
+    def close(handler):
+        """
+        Close the connection pools of the handler ollama clients.
+        """
+        client = getattr(handler, "_client", None)
+        if client is not None:
+            client._client.close()
+        async_client = getattr(handler, "_async_client", None)
+        if async_client is not None:
+            asyncio.get_running_loop().create_task(async_client._client.aclose())
+
+    def stats(self):
+        return {
+            "size": len(self.handlers),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "models": [key[0] for key in self.handlers],
+        }
+
+
+llm_handlers = LLMHandlerRegistry(LLM_HANDLERS_MAX)
+
 custom_llm_handlers = {
     "mistral-large-latest": ChatMistralAI(
         api_key=read_secret("mistral_api_key"), model="mistral-large-latest"
@@ -61,38 +251,544 @@ custom_llm_handlers = {
 }
 
 
-def get_default_llm_handler(model):
-    global current_model
-    global llm_handler
-    if model != current_model:
-        llm_handler = ChatOllama(
-            model="llama3.2", base_url=BASE_URL, temperature=0, timeout=300
+def local_model(model: str) -> str:
+    """
+    Ollama model serving the requested one, background work for "auto" stays local.
+    """
+    if not model:
+        return DEFAULT_MODEL
+    if model == AUTO_MODEL:
+        return AUTO_LOCAL_MODEL
+    return model
+
+
+def get_llm_handler(model: str, temperature: float = 0, timeout: int = 300):
+    """
+    Resolve the handler serving the given model, api models first then local Ollama ones.
+    """
+    if model in custom_llm_handlers:
+        return custom_llm_handlers[model]
+    return llm_handlers.get(local_model(model), temperature, timeout)
+
+
+# Requests let through to Ollama at once, grouped by model to avoid reloading weights.
+SCHEDULER_CONCURRENCY = int(
+    os.getenv("SCHEDULER_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", "2"))
+)
+SCHEDULER_MAX_BATCH = int(os.getenv("SCHEDULER_MAX_BATCH", "8"))
+SCHEDULER_MAX_WAIT = float(os.getenv("SCHEDULER_MAX_WAIT", "30"))
+scheduler = ModelScheduler(
+    SCHEDULER_CONCURRENCY, SCHEDULER_MAX_BATCH, SCHEDULER_MAX_WAIT
+)
+
+
+def llm_slot(model: str, priority: int):
+    """
+    Scheduler slot for a request to the given model, api models do not go through Ollama.
+    """
+    if model in custom_llm_handlers:
+        return contextlib.nullcontext()
+    keep_alive_policy.touch(local_model(model))
+    return scheduler.slot(local_model(model), priority)
+
+
+CHAT_SYSTEM_PROMPT = "You are a helpful assistant trying to politely answer and help the user as much as possible. Answer to the user request in a concise manner."
+
+
+CHAT_CACHE_PATH = os.getenv("CHAT_CACHE_PATH", "/app/ollama/data/chat_cache")
+CHAT_CACHE_ENTRIES = int(os.getenv("CHAT_CACHE_ENTRIES", "512"))
+CHAT_CACHE_BYTES = int(os.getenv("CHAT_CACHE_BYTES", str(64 * 1024 * 1024)))
+response_cache = ResponseCache(CHAT_CACHE_PATH, CHAT_CACHE_ENTRIES, CHAT_CACHE_BYTES)
+
+
+def cached_stream(response: str):
+    yield json.dumps({"token": response}) + "\n"
+    yield json.dumps(
+        {
+            "done": True,
+            "response": response,
+            "time_to_first_token": 0,
+            "duration": 0,
+            "cached": True,
+        }
+    ) + "\n"
+
+
+async def llm_stream(model: str, llm, messages, priority=INTERACTIVE, **llm_kwargs):
+    """
+    Yield the llm answer chunks, holding a scheduler slot for the whole generation.
+    """
+    async with llm_slot(model, priority):
+        stream = llm.astream(messages, **llm_kwargs)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            # Closing the stream closes the HTTP connection, which stops the generation.
+            await stream.aclose()
+
+
+async def stream_chat(request: Request, chunks, on_complete=None, details: dict = None):
+    """
+    Yield the llm answer chunks as NDJSON lines, one per generated token chunk.
+    The last line holds the full answer, timing information and the given `details`,
+    or the error and the partial answer when the generation failed.
+    Generation is aborted as soon as the client goes away so Ollama frees the GPU.
+    `on_complete` is called with the full answer once generated.
+    """
+    start = time.perf_counter()
+    time_to_first_token = None
+    content = []
+    try:
+        async for chunk in chunks:
+            if await request.is_disconnected():
+                log.info("Chat client disconnected, cancelling generation.")
+                return
+            if not chunk.content:
+                continue
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start
+                log.debug(f"Chat first token after {time_to_first_token:.3f}s")
+            content.append(chunk.content)
+            yield json.dumps({"token": chunk.content}) + "\n"
+
+        response = "".join(content)
+        if on_complete:
+            on_complete(response)
+        yield json.dumps(
+            {
+                "done": True,
+                "response": response,
+                "time_to_first_token": time_to_first_token,
+                "duration": time.perf_counter() - start,
+                "cached": False,
+                **(details or {}),
+            }
+        ) + "\n"
+    except Exception as e:
+        # The response headers are sent, end the stream with the error instead of cutting it.
+        log.exception("Failed streaming chat answer")
+        yield json.dumps(
+            {
+                "done": True,
+                "error": str(e),
+                "response": "".join(content),
+                "duration": time.perf_counter() - start,
+                **(details or {}),
+            }
+        ) + "\n"
+    finally:
+        await chunks.aclose()
+
+
+AUTO_MODEL = "auto"
+AUTO_LOCAL_MODEL = os.getenv("AUTO_LOCAL_MODEL", DEFAULT_MODEL)
+AUTO_CLOUD_MODEL = os.getenv("AUTO_CLOUD_MODEL", "mistral-large-latest")
+# Requests queued or running on the local GPU over which "auto" goes to the cloud.
+AUTO_MAX_QUEUE = int(os.getenv("AUTO_MAX_QUEUE", "2"))
+# Recent local time to first token, in seconds, over which "auto" goes to the cloud.
+AUTO_LATENCY_THRESHOLD = float(os.getenv("AUTO_LATENCY_THRESHOLD", "5"))
+# Delay without a local first token after which a hedged request is also sent to the cloud.
+AUTO_HEDGE_DELAY = float(os.getenv("AUTO_HEDGE_DELAY", "2"))
+
+
+class RouteStats:
+    """
+    Moving averages of the latency of each "auto" route, to tune the thresholds.
+    """
+
+    def __init__(self, routes, alpha: float = 0.2):
+        self.alpha = alpha
+        self.routes = {
+            route: {
+                "requests": 0,
+                "errors": 0,
+                "hedges": 0,
+                "hedges_won": 0,
+                "time_to_first_token": None,
+                "duration": None,
+            }
+            for route in routes
+        }
+
+    def record(self, route: str, metric: str, value: float):
+        stats = self.routes[route]
+        previous = stats[metric]
+        stats[metric] = (
+            value if previous is None else previous + self.alpha * (value - previous)
         )
-    return llm_handler
+
+    def count(self, route: str, counter: str):
+        self.routes[route][counter] += 1
+
+    def stats(self):
+        return self.routes
+
+
+route_stats = RouteStats(["local", "cloud"])
+
+
+def auto_routes():
+    return {
+        "local": AUTO_LOCAL_MODEL,
+        "cloud": AUTO_CLOUD_MODEL if AUTO_CLOUD_MODEL in custom_llm_handlers else None,
+    }
+
+
+def pick_route() -> str:
+    """
+    Route to the cloud when the local GPU is busy or has been slow lately.
+    """
+    if auto_routes()["cloud"] is None:
+        return "local"
+    if scheduler.depth() >= AUTO_MAX_QUEUE:
+        return "cloud"
+    local_latency = route_stats.routes["local"]["time_to_first_token"]
+    cloud_latency = route_stats.routes["cloud"]["time_to_first_token"]
+    if local_latency is not None and local_latency > AUTO_LATENCY_THRESHOLD:
+        if cloud_latency is None or cloud_latency < local_latency:
+            return "cloud"
+    return "local"
+
+
+async def auto_stream(messages, hedge: bool = False, details: dict = None):
+    """
+    Yield the answer chunks from the route picked for an "auto" request.
+    When hedging, a local request without a first token after AUTO_HEDGE_DELAY
+    is also sent to the cloud, the slower of the two is then cancelled.
+    The route serving the answer is written in `details`.
+    """
+    details = details if details is not None else {}
+    routes = auto_routes()
+    racers = {}
+
+    def launch(route: str):
+        route_stats.count(route, "requests")
+        model = routes[route]
+        generator = llm_stream(model, get_llm_handler(model), messages)
+        # Latencies are measured from the route launch, not from the hedge delay.
+        racers[asyncio.ensure_future(generator.__anext__())] = (
+            route,
+            generator,
+            time.perf_counter(),
+        )
+
+    route = pick_route()
+    launch(route)
+    can_hedge = route == "local" and routes["cloud"] is not None
+    timeout = AUTO_HEDGE_DELAY if hedge and can_hedge else None
+    hedged = False
+    winner = None
+    try:
+        while winner is None:
+            done, _ = await asyncio.wait(
+                racers, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                log.info("No local first token yet, hedging to the cloud.")
+                route_stats.count("local", "hedges")
+                launch("cloud")
+                hedged = True
+                timeout = None
+                continue
+
+            for task in done:
+                route, generator, start = racers.pop(task)
+                error = task.exception()
+                if error is None or isinstance(error, StopAsyncIteration):
+                    winner = route, generator, start, task
+                    break
+                log.warning(f"Route {route} failed: {error}")
+                route_stats.count(route, "errors")
+
+            if winner is None and not racers:
+                if not can_hedge or hedged:
+                    raise error
+                # Fall back to the cloud when the local model fails.
+                launch("cloud")
+                hedged = True
+                timeout = None
+    finally:
+        for task in racers:
+            task.cancel()
+        await asyncio.gather(*racers, return_exceptions=True)
+        for _, generator, _ in racers.values():
+            await generator.aclose()
+
+    route, generator, start, task = winner
+    details["route"] = route
+    if hedged:
+        route_stats.count(route, "hedges_won")
+    route_stats.record(route, "time_to_first_token", time.perf_counter() - start)
+    try:
+        if task.exception() is None:
+            yield task.result()
+            async for chunk in generator:
+                yield chunk
+        route_stats.record(route, "duration", time.perf_counter() - start)
+    finally:
+        await generator.aclose()
 
 
 @app.post("/ollama/chat")
-def chat(chat: Chat):
+async def chat(chat: Chat, request: Request):
     """
     Request the ai model to answer to a user query.
+    With `stream` set, the answer is sent token by token as NDJSON.
+    The "auto" model routes the request to the local model or the cloud depending on the load.
     """
-    llm = custom_llm_handlers.get(chat.model, get_default_llm_handler(chat.model))
-
     messages = [
-        (
-            "system",
-            "You are a helpful assistant trying to politely answer and help the user as much as possible. Answer to the user request in a concise manner.",
-        ),
+        ("system", CHAT_SYSTEM_PROMPT),
         ("human", chat.prompt),
     ]
 
-    response = llm.invoke(messages)
+    if chat.model == AUTO_MODEL:
+        details = {}
+        chunks = auto_stream(messages, chat.hedge, details)
+        if chat.stream:
+            return StreamingResponse(
+                stream_chat(request, chunks, details=details),
+                media_type="application/x-ndjson",
+            )
+        content = [chunk.content async for chunk in chunks]
+        return {"response": "".join(content), "cached": False, **details}
+
+    llm = get_llm_handler(chat.model, chat.temperature)
+
+    cache_key = None
+    if chat.cache and getattr(llm, "temperature", None) == 0:
+        cache_key = ResponseCache.key(
+            chat.model, CHAT_SYSTEM_PROMPT, chat.prompt, chat.temperature
+        )
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            if chat.stream:
+                return StreamingResponse(
+                    cached_stream(cached), media_type="application/x-ndjson"
+                )
+            return {"response": cached, "cached": True}
+
+    if chat.stream:
+        on_complete = None
+        if cache_key:
+            on_complete = lambda response: response_cache.put(cache_key, response)
+        return StreamingResponse(
+            stream_chat(request, llm_stream(chat.model, llm, messages), on_complete),
+            media_type="application/x-ndjson",
+        )
+
+    async with llm_slot(chat.model, INTERACTIVE):
+        response = await llm.ainvoke(messages)
+    if cache_key:
+        response_cache.put(cache_key, response.content)
+
+    return {"response": response.content, "cached": False}
+
+
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "128"))
+# Idle time in seconds after which a chat session expires.
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+# Estimated size of a conversation over which its older turns get summarized.
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "3000"))
+# Latest turns kept verbatim when compacting a conversation.
+SESSION_KEEP_TURNS = int(os.getenv("SESSION_KEEP_TURNS", "4"))
+# Keep the model loaded between turns, and its context large enough for the whole conversation.
+SESSION_KEEP_ALIVE = keep_alive_value(os.getenv("SESSION_KEEP_ALIVE", "30m"))
+SESSION_NUM_CTX = int(os.getenv("SESSION_NUM_CTX", "8192"))
+chat_sessions = SessionStore(SESSION_MAX_ENTRIES, SESSION_TTL)
+
+
+def session_llm_kwargs(session: ChatSession):
+    """
+    Ollama hints keeping the session model and its evaluated prefix around between turns.
+    """
+    if session.model in custom_llm_handlers:
+        return {}
+    return {
+        "keep_alive": SESSION_KEEP_ALIVE,
+        "options": {"temperature": session.temperature, "num_ctx": SESSION_NUM_CTX},
+    }
+
+
+def get_session(session_id: str) -> ChatSession:
+    session = chat_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+async def compact_session(session: ChatSession):
+    """
+    Summarize the oldest turns of a conversation over its token budget,
+    so per turn latency stays flat as the conversation grows.
+    The session lock is only held to read and apply the change, not during the
+    summarization, so the next message does not wait for it.
+    """
+    async with session.lock:
+        if session.compacting or session.estimated_tokens() <= SESSION_TOKEN_BUDGET:
+            return
+        cut = max(len(session.turns) - SESSION_KEEP_TURNS, 0)
+        if not cut:
+            return
+        compacted = session.turns[:cut]
+        previous_summary = session.summary
+        session.compacting = True
+
+    try:
+        transcript = "\n".join(
+            f"User: {human}\nAssistant: {ai}" for human, ai in compacted
+        )
+        summary_prompt = f"""Summarize the following conversation between a user and an assistant.
+        Keep every fact, name and request the assistant may need to answer the next questions, in a few sentences.
+
+        {f"Summary of the earlier conversation: {previous_summary}" if previous_summary else ""}
+
+        {transcript}
+        """
+        llm = get_llm_handler(session.model, session.temperature)
+        try:
+            async with llm_slot(session.model, BACKGROUND):
+                summary = await llm.ainvoke(summary_prompt)
+        except Exception:
+            log.exception(f"Failed compacting chat session {session.id}")
+            return
+
+        async with session.lock:
+            # Turns added meanwhile are kept, a conversation changed otherwise is left as is.
+            if session.turns[:cut] != compacted or session.summary != previous_summary:
+                log.info(f"Chat session {session.id} changed while compacting, skipping")
+                return
+            log.info(f"Compacted {cut} turns of chat session {session.id}")
+            session.summary = summary.content
+            session.turns = session.turns[cut:]
+    finally:
+        session.compacting = False
+
+
+def finish_session_turn(session: ChatSession, prompt: str, response: str):
+    session.add_turn(prompt, response)
+    if session.estimated_tokens() > SESSION_TOKEN_BUDGET:
+        asyncio.create_task(compact_session(session))
+
+
+async def stream_session_turn(request: Request, session: ChatSession, prompt: str):
+    async with session.lock:
+        llm = get_llm_handler(session.model, session.temperature)
+        chunks = llm_stream(
+            session.model,
+            llm,
+            session.messages(prompt),
+            **session_llm_kwargs(session),
+        )
+        async for line in stream_chat(
+            request,
+            chunks,
+            lambda response: finish_session_turn(session, prompt, response),
+        ):
+            yield line
+
+
+@app.post("/ollama/sessions")
+async def create_session(session: SessionCreate):
+    """
+    Start a multi-turn chat session kept server side.
+    """
+    chat_session = chat_sessions.create(
+        session.model, session.system or CHAT_SYSTEM_PROMPT, session.temperature
+    )
+    return {"session_id": chat_session.id, "expires_in": SESSION_TTL}
+
+
+@app.get("/ollama/sessions/{session_id}")
+async def read_session(session_id: str):
+    return get_session(session_id).to_dict()
+
+
+@app.post("/ollama/sessions/{session_id}/messages")
+async def session_message(session_id: str, message: SessionMessage, request: Request):
+    """
+    Answer the next user message of a chat session, given the previous turns.
+    With `stream` set, the answer is sent token by token as NDJSON.
+    """
+    session = get_session(session_id)
+    if message.stream:
+        return StreamingResponse(
+            stream_session_turn(request, session, message.prompt),
+            media_type="application/x-ndjson",
+        )
+
+    async with session.lock:
+        llm = get_llm_handler(session.model, session.temperature)
+        async with llm_slot(session.model, INTERACTIVE):
+            response = await llm.ainvoke(
+                session.messages(message.prompt), **session_llm_kwargs(session)
+            )
+        finish_session_turn(session, message.prompt, response.content)
 
     return {"response": response.content}
 
 
-# Store for ongoing story generations
-active_stories: Dict[str, dict] = {}
+@app.delete("/ollama/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not chat_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session_id": session_id, "status": "deleted"}
+
+
+# Store for ongoing story generations, "memory" or "sqlite" to resume them after a restart
+STORY_STORE = os.getenv("STORY_STORE", "sqlite")
+STORY_DB_PATH = os.getenv("STORY_DB_PATH", "/app/ollama/data/stories.db")
+STORY_MAX_ENTRIES = int(os.getenv("STORY_MAX_ENTRIES", "256"))
+# Idle time in seconds after which a finished story is evicted.
+STORY_TTL = float(os.getenv("STORY_TTL", "3600"))
+active_stories = create_story_store(
+    STORY_STORE, path=STORY_DB_PATH, max_entries=STORY_MAX_ENTRIES, ttl=STORY_TTL
+)
+
+STORY_CHANNEL_QUEUE_SIZE = int(os.getenv("STORY_CHANNEL_QUEUE_SIZE", "64"))
+# Minimum delay between two partial chapter updates sent to the viewers.
+STORY_PARTIAL_INTERVAL = float(os.getenv("STORY_PARTIAL_INTERVAL", "0.25"))
+
+
+class StoryChannel:
+    """
+    Publish/subscribe channel fanning a story updates out to all its viewers.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=STORY_CHANNEL_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, message: dict):
+        for queue in self.subscribers:
+            if queue.full():
+                # Slow viewer, drop its oldest update, later ones supersede it.
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+
+story_channels: Dict[str, StoryChannel] = {}
+
+
+def update_story(story_id: str, **changes):
+    """
+    Update the story state and notify its viewers.
+    """
+    story_state = active_stories[story_id]
+    story_state.update(changes)
+    active_stories.save(story_id)
+    channel = story_channels.get(story_id)
+    if channel:
+        channel.publish(dict(story_state))
+    if story_state["status"] in ["complete", "error"]:
+        story_channels.pop(story_id, None)
 
 
 @app.post("/ollama/story")
@@ -111,6 +807,7 @@ async def start_story(story: Story):
         "title": None,
         "summary": None,
     }
+    story_channels[story_id] = StoryChannel()
 
     # Start the story generation process
     asyncio.create_task(generate_story(story_id, story))
@@ -118,12 +815,94 @@ async def start_story(story: Story):
     return {"story_id": story_id}
 
 
-async def generate_story(story_id: str, story: Story):
+# Ollama serves OLLAMA_NUM_PARALLEL requests per model at once, more would only queue there.
+STORY_POLISH_CONCURRENCY = int(
+    os.getenv("STORY_POLISH_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", "2"))
+)
+polish_semaphore = asyncio.Semaphore(STORY_POLISH_CONCURRENCY)
+
+
+async def polish_chapter(story_id: str, llm, initial_story: dict, chapter_index: int):
+    """
+    Polish a single chapter of the story outline and record it in the story state.
+    """
+    chapter_count = active_stories[story_id]["chapter_count"]
+    chapter_content = initial_story[f"chapter_{chapter_index}"]
+
+    # Create a prompt for polishing the chapter
+    polish_prompt = f"""Please polish and expand this chapter of a children's story to make it more engaging and detailed.
+    Keep the same main events but add more descriptive language, dialogue, and emotional depth.
+    Make it suitable for children while being interesting and educational.
+
+    Chapter {chapter_index + 1} of "{initial_story["title"]}":
+    {chapter_content}
+
+    Story summary for context:
+    {initial_story["summary"]}
+    """
+
+    model = active_stories[story_id]["model"]
+    async with polish_semaphore, llm_slot(model, BACKGROUND):
+        log.info(f"Polishing chapter {chapter_index} of {chapter_count}")
+        chapter_name = f"chapter {chapter_index}"
+        content = ""
+        last_publish = 0.0
+        async for chunk in llm.astream(polish_prompt):
+            content += chunk.content
+            channel = story_channels.get(story_id)
+            now = time.monotonic()
+            if channel and now - last_publish >= STORY_PARTIAL_INTERVAL:
+                last_publish = now
+                story_state = active_stories[story_id]
+                channel.publish(
+                    {
+                        "status": story_state["status"],
+                        "current_chapter": story_state["current_chapter"],
+                        "chapter_count": chapter_count,
+                        "partial_chapter": chapter_name,
+                        "partial_content": content,
+                    }
+                )
+
+    # Chapters may finish out of order, keep them sorted for the readers.
+    chapters = dict(active_stories[story_id]["chapters"])
+    chapters[chapter_name] = content
+    update_story(
+        story_id,
+        chapters=dict(
+            sorted(chapters.items(), key=lambda item: int(item[0].split(" ")[1]))
+        ),
+        current_chapter=len(chapters),
+    )
+
+
+async def stream_outline(structured_llm, prompt: str):
+    """
+    Yield the (key, value) fields of the structured story outline as soon as each is complete.
+    A field is complete once the model starts writing the next one, or when the stream ends.
+    """
+    outline = {}
+    emitted = set()
+    async for outline in structured_llm.astream(prompt):
+        if not isinstance(outline, dict):
+            continue
+        for key in list(outline)[:-1]:
+            if key not in emitted:
+                emitted.add(key)
+                yield key, outline[key]
+
+    for key, value in outline.items():
+        if key not in emitted:
+            yield key, value
+
+
+async def generate_story(story_id: str, story: Story, outline: dict = None):
     """
     Generate the story in the background and update the story state
+    When resuming with a known outline, only the chapters not polished yet are generated.
     """
     try:
-        llm = custom_llm_handlers.get(story.model, get_default_llm_handler(story.model))
+        llm = get_llm_handler(story.model)
 
         # First pass: Generate story structure
         story_schema = {
@@ -153,54 +932,121 @@ async def generate_story(story_id: str, story: Story):
             story_schema["required"].append(chapter_name)
 
         structured_llm = llm.with_structured_output(schema=story_schema)
-        initial_story = await structured_llm.ainvoke(
-            f"""Please write a kid story in {story.chapter_count} chapters about {story.subject}.
+        outline_prompt = f"""Please write a kid story in {story.chapter_count} chapters about {story.subject}.
             First, create a title and a brief summary of the story.
             Then, write each chapter with a few sentences that outline the main events.
             Make sure the story has a clear beginning, middle, and end."""
-        )
 
-        # Update story state with initial structure
-        active_stories[story_id].update(
-            {
-                "title": initial_story["title"],
-                "summary": initial_story["summary"],
-                "status": "generating_chapters",
-            }
-        )
+        initial_story = {}
+        pending_chapters = []
+        polish_tasks = []
 
-        # Second pass: Polish each chapter
-        for chapter_index in range(story.chapter_count):
-            log.info(f"Polishing chapter {chapter_index} of {story.chapter_count}")
-            chapter_name = f"chapter_{chapter_index}"
-            chapter_content = initial_story[chapter_name]
+        def add_outline_field(key, value):
+            """
+            Record a complete outline field, and start polishing the chapters
+            as soon as the title and summary they depend on are known.
+            """
+            initial_story[key] = value
+            if key.startswith("chapter_"):
+                chapter_index = int(key.split("_")[1])
+                polished = active_stories[story_id]["chapters"]
+                if (
+                    chapter_index < story.chapter_count
+                    and f"chapter {chapter_index}" not in polished
+                ):
+                    pending_chapters.append(chapter_index)
+            if "title" not in initial_story or "summary" not in initial_story:
+                return
 
-            # Create a prompt for polishing the chapter
-            polish_prompt = f"""Please polish and expand this chapter of a children's story to make it more engaging and detailed.
-            Keep the same main events but add more descriptive language, dialogue, and emotional depth.
-            Make it suitable for children while being interesting and educational.
+            if active_stories[story_id]["status"] == "initializing":
+                # Update story state with initial structure
+                update_story(
+                    story_id,
+                    title=initial_story["title"],
+                    summary=initial_story["summary"],
+                    status="generating_chapters",
+                )
 
-            Chapter {chapter_index + 1} of "{initial_story["title"]}":
-            {chapter_content}
+            # Second pass: Polish the chapters concurrently, each only depends on the outline
+            while pending_chapters:
+                polish_tasks.append(
+                    asyncio.create_task(
+                        polish_chapter(
+                            story_id, llm, initial_story, pending_chapters.pop(0)
+                        )
+                    )
+                )
 
-            Story summary for context:
-            {initial_story["summary"]}
-            """
+        try:
+            if outline:
+                for key, value in outline.items():
+                    add_outline_field(key, value)
+            elif story.incremental:
+                async with llm_slot(story.model, BACKGROUND):
+                    async for key, value in stream_outline(
+                        structured_llm, outline_prompt
+                    ):
+                        add_outline_field(key, value)
+            else:
+                async with llm_slot(story.model, BACKGROUND):
+                    initial_outline = await structured_llm.ainvoke(outline_prompt)
+                for key, value in initial_outline.items():
+                    add_outline_field(key, value)
 
-            # Get the polished version
-            polished_chapter = await llm.ainvoke(polish_prompt)
-            active_stories[story_id]["chapters"][f"chapter {chapter_index}"] = (
-                polished_chapter.content
-            )
-            active_stories[story_id]["current_chapter"] = chapter_index + 1
+            missing = [
+                chapter_index
+                for chapter_index in range(story.chapter_count)
+                if f"chapter_{chapter_index}" not in initial_story
+            ]
+            if missing:
+                raise Exception(f"Story outline is missing chapters {missing}.")
+            active_stories.save_outline(story_id, initial_story)
+            await asyncio.gather(*polish_tasks)
+        except BaseException:
+            for task in polish_tasks:
+                task.cancel()
+            raise
 
         # Mark story as complete
-        active_stories[story_id]["status"] = "complete"
+        update_story(story_id, status="complete")
 
     except Exception as e:
         log.exception(f"Failed generating story.")
-        active_stories[story_id]["status"] = "error"
-        active_stories[story_id]["error"] = str(e)
+        update_story(story_id, status="error", error=str(e))
+
+
+async def evict_expired():
+    """
+    Periodically drop the finished stories and the chat sessions idle for too long.
+    """
+    while True:
+        await asyncio.sleep(min(STORY_TTL, SESSION_TTL, 60))
+        active_stories.evict()
+        chat_sessions.evict()
+
+
+@app.on_event("startup")
+async def resume_stories():
+    """
+    Resume the story generations interrupted by a restart, from their last polished chapter.
+    """
+    for story_id in active_stories.unfinished():
+        state = active_stories[story_id]
+        story = Story(
+            subject=state["subject"],
+            model=state["model"],
+            chapter_count=state["chapter_count"],
+        )
+        outline = active_stories.outline(story_id)
+        if not outline:
+            state.update(
+                {"status": "initializing", "current_chapter": 0, "chapters": {}}
+            )
+            active_stories.save(story_id)
+        log.info(f"Resuming story {story_id} ({len(state['chapters'])} chapters done)")
+        story_channels[story_id] = StoryChannel()
+        asyncio.create_task(generate_story(story_id, story, outline))
+    asyncio.create_task(evict_expired())
 
 
 @app.websocket("/ollama/ws/story/{story_id}")
@@ -209,49 +1055,60 @@ async def websocket_endpoint(websocket: WebSocket, story_id: str):
     WebSocket endpoint for story generation progress
     """
     await websocket.accept()
-    last_chapter = None
-    last_status = None
+    if story_id not in active_stories:
+        await websocket.send_json({"status": "error", "message": "Story not found"})
+        return
+
+    channel = story_channels.get(story_id)
+    queue = channel.subscribe() if channel else None
     try:
+        # Send the current state first, then every update as it is published.
+        message = dict(active_stories[story_id])
         while True:
-            if story_id not in active_stories:
-                await websocket.send_json(
-                    {"status": "error", "message": "Story not found"}
-                )
+            await websocket.send_json(message)
+            if message["status"] in ["complete", "error"] or queue is None:
                 break
-
-            story_state = active_stories[story_id]
-
-            if last_status is None or last_status != story_state["status"]:
-                await websocket.send_json(story_state)
-                last_status = story_state["status"]
-                last_chapter = story_state.get("current_chapter")
-            elif story_state["status"] == "generating_chapters":
-                if (
-                    last_chapter is None
-                    or last_chapter != story_state["current_chapter"]
-                ):
-                    log.info(f"Sending story state {story_state}")
-                    await websocket.send_json(story_state)
-                    last_chapter = story_state["current_chapter"]
-
-            if story_state["status"] in ["complete", "error"]:
-                break
-
-            await asyncio.sleep(1)  # Poll every second
+            message = await queue.get()
 
     except WebSocketDisconnect:
         pass
     except Exception as e:
         log.exception(f"Failed getting story {story_id} status")
         await websocket.send_json({"status": "error", "message": str(e)})
+    finally:
+        if channel and queue:
+            channel.unsubscribe(queue)
 
 
-@app.get("/ollama/models")
-def models():
+@app.get("/ollama/stats")
+def stats():
+    """
+    Expose the service internal counters.
+    """
+    return {
+        "llm_handlers": llm_handlers.stats(),
+        "stories": active_stories.stats(),
+        "chat_cache": response_cache.stats(),
+        "scheduler": scheduler.stats(),
+        "sessions": chat_sessions.stats(),
+        "routes": route_stats.stats(),
+    }
+
+
+MODELS_CACHE_TTL = float(os.getenv("MODELS_CACHE_TTL", "60"))
+
+
+async def fetch_models():
     """
     List the currently available models on the llm.
     """
     model_list = [
+        {
+            "name": "Auto",
+            "value": AUTO_MODEL,
+            "description": "Local model, or Mistral when the local one is busy.",
+            "type": "api",
+        },
         {
             "name": "Mistral Lage",
             "value": "mistral-large-latest",
@@ -260,8 +1117,8 @@ def models():
         }
     ]
 
-    response = requests.get(f"{BASE_URL}/api/tags")
-    if not response.ok:
+    response = await ollama_client.get("/api/tags")
+    if not response.is_success:
         raise Exception(
             f"Failed fetching model list from Ollama: {response.status_code}:{response.text}"
         )
@@ -284,3 +1141,149 @@ def models():
         )
 
     return model_list
+
+
+class ModelsCache:
+    """
+    Model list cache served stale while a single background refresh runs.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.models = None
+        self.updated = 0.0
+        self.refresh_task = None
+
+    async def _refresh(self):
+        try:
+            self.models = await fetch_models()
+            self.updated = time.monotonic()
+        except Exception:
+            log.exception("Failed refreshing the model list")
+            raise
+        finally:
+            self.refresh_task = None
+
+    def refresh(self) -> asyncio.Task:
+        if self.refresh_task is None:
+            self.refresh_task = asyncio.create_task(self._refresh())
+            # Background refreshes failures are already logged.
+            self.refresh_task.add_done_callback(
+                lambda task: task.cancelled() or task.exception()
+            )
+        return self.refresh_task
+
+    async def get(self):
+        if self.models is None:
+            await asyncio.shield(self.refresh())
+        elif time.monotonic() - self.updated > self.ttl:
+            self.refresh()
+        return self.models
+
+
+models_cache = ModelsCache(MODELS_CACHE_TTL)
+
+
+@app.on_event("startup")
+async def preload_models():
+    models_cache.refresh()
+
+
+@app.on_event("shutdown")
+async def close_ollama_client():
+    await ollama_client.aclose()
+
+
+@app.get("/ollama/models")
+async def models():
+    """
+    List the currently available models on the llm, from cache.
+    """
+    return await models_cache.get()
+
+
+@app.post("/ollama/models/refresh")
+async def refresh_models():
+    """
+    Fetch the model list from Ollama again, for instance after downloading a new model.
+    """
+    await asyncio.shield(models_cache.refresh())
+    return models_cache.models
+
+
+# Models loaded on startup so the first requests do not pay the loading time.
+WARMUP_MODELS = [
+    model for model in os.getenv("WARMUP_MODELS", DEFAULT_MODEL).split(",") if model
+]
+
+
+async def warm_up_model(model: str, keep_alive: Union[int, str] = ""):
+    """
+    Load the model in Ollama, an empty generation only loads the weights.
+    """
+    if keep_alive == "":
+        keep_alive = keep_alive_policy.keep_alive(model)
+    keep_alive = keep_alive_value(keep_alive)
+    start = time.perf_counter()
+    async with llm_slot(model, BACKGROUND):
+        response = await ollama_client.post(
+            "/api/generate",
+            json={"model": model, "keep_alive": keep_alive},
+            timeout=300,
+        )
+    if not response.is_success:
+        raise Exception(
+            f"Failed warming up {model}: {response.status_code}:{response.text}"
+        )
+    duration = time.perf_counter() - start
+    log.info(f"Warmed up {model} in {duration:.1f}s (keep alive {keep_alive})")
+    return {"model": model, "keep_alive": keep_alive, "duration": duration}
+
+
+async def warm_up_models(models: List[str], keep_alive: Union[int, str] = ""):
+    results = []
+    for model in models:
+        try:
+            results.append(await warm_up_model(model, keep_alive))
+        except Exception as e:
+            log.exception(f"Failed warming up {model}")
+            results.append({"model": model, "error": str(e)})
+    return results
+
+
+@app.on_event("startup")
+async def warm_up_on_startup():
+    asyncio.create_task(warm_up_models(WARMUP_MODELS))
+
+
+@app.post("/ollama/warmup")
+async def warmup(warmup: Warmup):
+    """
+    Load the given models in Ollama so they answer instantly.
+    """
+    return await warm_up_models(warmup.models or WARMUP_MODELS, warmup.keep_alive)
+
+
+@app.get("/ollama/residency")
+async def residency():
+    """
+    List the models currently loaded by Ollama, which answer without loading time,
+    with the keep-alive policy applied to them.
+    """
+    response = await ollama_client.get("/api/ps")
+    if not response.is_success:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Failed fetching loaded models from Ollama: {response.status_code}",
+        )
+    return [
+        {
+            "model": model["model"],
+            "resident": True,
+            "expires_at": model.get("expires_at"),
+            "size_vram": model.get("size_vram"),
+            "keep_alive": keep_alive_policy.keep_alive(model["model"]),
+            "hot": keep_alive_policy.is_hot(model["model"]),
+        }
+        for model in response.json().get("models", [])
+    ]
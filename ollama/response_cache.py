@@ -0,0 +1,99 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+
+from lru_files import directory_size, evict, touch
+
+log = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Make trivially different prompts share the same cache entry.
+    """
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+class ResponseCache:
+    """
+    Two tiers LRU cache of the llm answers: a bounded in memory tier in front of
+    a size bounded on disk tier, one json file per answer.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_entries: int = 512,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory: OrderedDict = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.disk_bytes = directory_size(directory)
+
+    @staticmethod
+    def key(model: str, system: str, prompt: str, temperature: float) -> str:
+        data = json.dumps([model, system, normalize_prompt(prompt), temperature])
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key: str, response: str):
+        self.memory[key] = response
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str):
+        if key in self.memory:
+            self.memory_hits += 1
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                response = json.load(f)["response"]
+            touch(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self._remember(key, response)
+        return response
+
+    def put(self, key: str, response: str):
+        self._remember(key, response)
+        path = self._path(key)
+        data = json.dumps({"response": response}).encode("utf-8")
+        try:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+            self.disk_bytes += len(data) - previous
+        except OSError as e:
+            log.warning(f"Failed writing response cache entry {key}: {e}")
+            return
+        if self.disk_bytes > self.max_bytes:
+            self.disk_bytes, _ = evict(self.directory, self.disk_bytes, self.max_bytes)
+
+    def stats(self):
+        return {
+            "memory_entries": len(self.memory),
+            "disk_bytes": self.disk_bytes,
+            "max_bytes": self.max_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
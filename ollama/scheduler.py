@@ -0,0 +1,158 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class Waiter:
+    def __init__(self, model: str, priority: int):
+        self.model = model
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class ModelScheduler:
+    """
+    Admission scheduler in front of Ollama grouping the requests by model,
+    so Ollama does not keep unloading and reloading weights between requests.
+
+    Requests for the loaded model are served in batches of up to `max_batch`,
+    the scheduler only switches model once the running requests are drained.
+    Interactive requests go ahead of background ones, and any request waiting
+    more than `max_wait` seconds is served next so nothing starves.
+    """
+
+    def __init__(
+        self, max_concurrency: int = 2, max_batch: int = 8, max_wait: float = 30
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queues = {}
+        self.current_model = None
+        self.running = 0
+        self.batch_served = 0
+        self.switches = 0
+        self.granted = 0
+        self.waits = deque(maxlen=256)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, model: str, priority: int = INTERACTIVE):
+        """
+        Wait for the scheduler to let a request for `model` through Ollama.
+        """
+        waiter = Waiter(model, priority)
+        queue = self.queues.setdefault(model, (deque(), deque()))[priority]
+        queue.append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                queue.remove(waiter)
+            else:
+                self._release()
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self.queues[waiter.model][waiter.priority].popleft()
+            self.running += 1
+            self.batch_served += 1
+            self.granted += 1
+            self.waits.append(time.monotonic() - waiter.enqueued)
+            waiter.future.set_result(None)
+
+    def _head(self, model: str, now: float):
+        """
+        Next waiter for the model, interactive first unless a background one starves.
+        """
+        interactive, background = self.queues.get(model, ((), ()))
+        if background and now - background[0].enqueued > self.max_wait:
+            return background[0]
+        if interactive:
+            return interactive[0]
+        if background:
+            return background[0]
+        return None
+
+    def _next_waiter(self):
+        now = time.monotonic()
+        heads = [
+            queue[0] for queues in self.queues.values() for queue in queues if queue
+        ]
+        if not heads:
+            return None
+
+        others = [waiter for waiter in heads if waiter.model != self.current_model]
+        starving = [
+            waiter for waiter in others if now - waiter.enqueued > self.max_wait
+        ]
+        current = self._head(self.current_model, now)
+        if current is not None:
+            keep = not others or (
+                self.batch_served < self.max_batch
+                and not starving
+                and (
+                    current.priority == INTERACTIVE
+                    or not any(waiter.priority == INTERACTIVE for waiter in others)
+                )
+            )
+            if keep:
+                return current
+
+        # Let the running requests of the loaded model drain before switching.
+        if self.running > 0:
+            return None
+
+        interactive = [waiter for waiter in others if waiter.priority == INTERACTIVE]
+        candidates = starving or interactive or others or heads
+        model = min(candidates, key=lambda waiter: waiter.enqueued).model
+        if model != self.current_model:
+            log.debug(f"Scheduler switching from {self.current_model} to {model}")
+            self.current_model = model
+            self.switches += 1
+        self.batch_served = 0
+        return self._head(model, now)
+
+    def depth(self) -> int:
+        """
+        Requests running or waiting for Ollama.
+        """
+        return self.running + sum(
+            len(queue) for queues in self.queues.values() for queue in queues
+        )
+
+    def stats(self):
+        return {
+            "current_model": self.current_model,
+            "running": self.running,
+            "depth": self.depth(),
+            "granted": self.granted,
+            "switches": self.switches,
+            "queues": {
+                model: {"interactive": len(interactive), "background": len(background)}
+                for model, (interactive, background) in self.queues.items()
+                if interactive or background
+            },
+            "average_wait": sum(self.waits) / len(self.waits) if self.waits else 0,
+            "max_wait": max(self.waits, default=0),
+        }
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count, about 4 characters per token for the usual models.
+    """
+    return len(text) // 4 + 1
+
+
+class ChatSession:
+    """
+    Server side conversation state.
+    Turns are replayed in the same order on every request so Ollama can reuse
+    the already evaluated prefix, older turns are folded into `summary` once compacted.
+    """
+
+    def __init__(self, model: str, system: str, temperature: float = 0):
+        self.id = str(uuid.uuid4())
+        self.model = model
+        self.system = system
+        self.temperature = temperature
+        self.summary = None
+        self.turns = []
+        self.lock = asyncio.Lock()
+        self.compacting = False
+        self.last_access = time.monotonic()
+
+    def system_prompt(self) -> str:
+        if not self.summary:
+            return self.system
+        return f"{self.system}\n\nSummary of the conversation so far:\n{self.summary}"
+
+    def messages(self, prompt: str):
+        messages = [("system", self.system_prompt())]
+        for human, ai in self.turns:
+            messages += [("human", human), ("ai", ai)]
+        messages.append(("human", prompt))
+        return messages
+
+    def add_turn(self, prompt: str, answer: str):
+        self.turns.append((prompt, answer))
+        self.last_access = time.monotonic()
+
+    def estimated_tokens(self) -> int:
+        return estimate_tokens(self.system_prompt()) + sum(
+            estimate_tokens(human) + estimate_tokens(ai) for human, ai in self.turns
+        )
+
+    def to_dict(self):
+        return {
+            "session_id": self.id,
+            "model": self.model,
+            "summary": self.summary,
+            "turns": [{"prompt": human, "response": ai} for human, ai in self.turns],
+            "estimated_tokens": self.estimated_tokens(),
+        }
+
+
+class SessionStore:
+    """
+    LRU store of the chat sessions, expiring them after `ttl` seconds of inactivity.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 1800):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sessions: OrderedDict = OrderedDict()
+        self.expired = 0
+
+    def create(self, model: str, system: str, temperature: float = 0) -> ChatSession:
+        session = ChatSession(model, system, temperature)
+        self.sessions[session.id] = session
+        self.evict()
+        return session
+
+    def get(self, session_id: str):
+        session = self.sessions.get(session_id)
+        if session is not None:
+            self.sessions.move_to_end(session_id)
+            session.last_access = time.monotonic()
+        return session
+
+    def delete(self, session_id: str):
+        return self.sessions.pop(session_id, None) is not None
+
+    def evict(self):
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if (
+                len(self.sessions) > self.max_entries
+                or now - session.last_access > self.ttl
+            ):
+                log.debug(f"Expiring chat session {session_id}")
+                del self.sessions[session_id]
+                self.expired += 1
+
+    def stats(self):
+        return {
+            "size": len(self.sessions),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "expired": self.expired,
+        }
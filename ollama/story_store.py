@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ["complete", "error"]
+
+
+class MemoryStoryStore:
+    """
+    In memory LRU store of the story states.
+    Finished stories are evicted once idle for `ttl` seconds, or when over `max_entries`.
+    Stories still being generated are never evicted.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stories: OrderedDict = OrderedDict()
+        self.outlines = {}
+        self.last_access = {}
+        self.evictions = 0
+
+    def __contains__(self, story_id: str):
+        return story_id in self.stories
+
+    def __getitem__(self, story_id: str) -> dict:
+        state = self.stories[story_id]
+        self.stories.move_to_end(story_id)
+        self.last_access[story_id] = time.monotonic()
+        return state
+
+    def __setitem__(self, story_id: str, state: dict):
+        self.stories[story_id] = state
+        self.save(story_id)
+        self.evict()
+
+    def __len__(self):
+        return len(self.stories)
+
+    def save(self, story_id: str):
+        """
+        Record the story state changed.
+        """
+        self.stories.move_to_end(story_id)
+        self.last_access[story_id] = time.monotonic()
+
+    def save_outline(self, story_id: str, outline: dict):
+        self.outlines[story_id] = outline
+
+    def outline(self, story_id: str):
+        return self.outlines.get(story_id)
+
+    def unfinished(self):
+        """
+        List the stories whose generation was interrupted, none are kept over a restart in memory.
+        """
+        return []
+
+    def delete(self, story_id: str):
+        self.stories.pop(story_id, None)
+        self.outlines.pop(story_id, None)
+        self.last_access.pop(story_id, None)
+
+    def evict(self):
+        """
+        Drop the idle finished stories, then the least recently used finished ones over capacity.
+        """
+        now = time.monotonic()
+        finished = [
+            story_id
+            for story_id, state in self.stories.items()
+            if state["status"] in FINISHED_STATUSES
+        ]
+        overflow = len(self.stories) - self.max_entries
+        for story_id in finished:
+            if overflow > 0 or now - self.last_access[story_id] > self.ttl:
+                log.debug(f"Evicting story {story_id}")
+                self.delete(story_id)
+                self.evictions += 1
+                overflow -= 1
+
+    def stats(self):
+        return {
+            "size": len(self.stories),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteStoryStore(MemoryStoryStore):
+    """
+    Story store writing every state change through to a local SQLite database,
+    so interrupted generations can be resumed after a restart.
+    """
+
+    def __init__(self, path: str, max_entries: int = 256, ttl: float = 3600):
+        super().__init__(max_entries, ttl)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS stories (id TEXT PRIMARY KEY, state TEXT NOT NULL, outline TEXT)"
+        )
+        for story_id, state in self.db.execute("SELECT id, state FROM stories"):
+            self.stories[story_id] = json.loads(state)
+            self.last_access[story_id] = time.monotonic()
+        for story_id, outline in self.db.execute(
+            "SELECT id, outline FROM stories WHERE outline IS NOT NULL"
+        ):
+            self.outlines[story_id] = json.loads(outline)
+        log.info(f"Loaded {len(self.stories)} stories from {path}")
+
+    def save(self, story_id: str):
+        super().save(story_id)
+        self.db.execute(
+            "INSERT INTO stories (id, state) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET state = excluded.state",
+            (story_id, json.dumps(self.stories[story_id])),
+        )
+
+    def save_outline(self, story_id: str, outline: dict):
+        super().save_outline(story_id, outline)
+        self.db.execute(
+            "UPDATE stories SET outline = ? WHERE id = ?",
+            (json.dumps(outline), story_id),
+        )
+
+    def unfinished(self):
+        return [
+            story_id
+            for story_id, state in self.stories.items()
+            if state["status"] not in FINISHED_STATUSES
+        ]
+
+    def delete(self, story_id: str):
+        super().delete(story_id)
+        self.db.execute("DELETE FROM stories WHERE id = ?", (story_id,))
+
+
+def create_story_store(backend: str, **kwargs):
+    if backend == "sqlite":
+        return SQLiteStoryStore(**kwargs)
+    kwargs.pop("path", None)
+    return MemoryStoryStore(**kwargs)
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from lru_files import directory_size, evict, touch
+
+log = logging.getLogger(__name__)
+
+
+class AudioCache:
+    """
+    Content addressed on disk cache of the generated audio or transcriptions, one file per
+    output, evicting the least recently used ones once over `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self.size = directory_size(directory)
+
+    @staticmethod
+    def key(**parameters) -> str:
+        data = json.dumps(parameters, sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            touch(path)
+        except OSError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return content
+
+    def put(self, key: str, content: bytes):
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(content)
+            with self.lock:
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(temp_path, path)
+                self.size += len(content) - previous
+                if self.size > self.max_bytes:
+                    self.size, evicted = evict(
+                        self.directory, self.size, self.max_bytes
+                    )
+                    self.evictions += evicted
+        except OSError as e:
+            log.warning(f"Failed caching audio {key}: {e}")
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,181 @@
+import io
+import logging
+import struct
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+log = logging.getLogger(__name__)
+
+AUDIO_FORMATS = {
+    "mp3": {"media_type": "audio/mpeg", "format": "MP3", "subtype": "MPEG_LAYER_III"},
+    "opus": {"media_type": "audio/ogg", "format": "OGG", "subtype": "OPUS"},
+    "wav": {"media_type": "audio/wav", "format": "WAV", "subtype": "PCM_16"},
+    # L16 is big endian (RFC 2586).
+    "pcm": {
+        "media_type": "audio/L16",
+        "format": "RAW",
+        "subtype": "PCM_16",
+        "endian": "BIG",
+    },
+}
+# Samples streamed after a wav header, little endian like in wav files.
+WAV_DATA_FORMAT = {"format": "RAW", "subtype": "PCM_16", "endian": "LITTLE"}
+
+MP3_SAMPLE_RATES = [8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000]
+OPUS_SAMPLE_RATES = [8000, 12000, 16000, 24000, 48000]
+OPUS_BITRATES = (6, 256)
+SAMPLE_RATES = (8000, 192000)
+
+
+def mp3_bitrates(sample_rate):
+    """
+    Bitrate range of the mpeg version used for the sample rate.
+    """
+    if sample_rate >= 32000:
+        return 32, 320
+    if sample_rate >= 16000:
+        return 8, 160
+    return 8, 64
+
+
+def validate_format(audio_format, sample_rate):
+    """
+    Return an error message when the format can not be produced, None otherwise.
+    """
+    if audio_format not in AUDIO_FORMATS:
+        return f"Unsupported format {audio_format}, use one of {list(AUDIO_FORMATS)}."
+    if not SAMPLE_RATES[0] <= sample_rate <= SAMPLE_RATES[1]:
+        return f"Sample rate must be between {SAMPLE_RATES[0]} and {SAMPLE_RATES[1]}."
+    if audio_format == "opus" and sample_rate not in OPUS_SAMPLE_RATES:
+        return f"Opus sample rate must be one of {OPUS_SAMPLE_RATES}."
+    if audio_format == "mp3" and sample_rate not in MP3_SAMPLE_RATES:
+        return f"Unsupported mp3 sample rate {sample_rate}."
+    return None
+
+
+def media_type(audio_format, sample_rate, channels=1):
+    if audio_format == "pcm":
+        return f"audio/L16; rate={sample_rate}; channels={channels}"
+    return AUDIO_FORMATS[audio_format]["media_type"]
+
+
+def resample(audio, sample_rate, target_rate):
+    if sample_rate == target_rate:
+        return audio
+    divisor = gcd(sample_rate, target_rate)
+    return resample_poly(audio, target_rate // divisor, sample_rate // divisor).astype(
+        np.float32
+    )
+
+
+def compression_level(bitrate, bitrates):
+    """
+    libsndfile compression level giving about the requested bitrate in kbps,
+    it maps the level linearly onto the codec bitrate range.
+    """
+    low, high = bitrates
+    bitrate = min(max(bitrate, low), high)
+    return (high - bitrate) / (high - low)
+
+
+def open_encoder(buffer, audio_format, target_rate, channels=1, bitrate=48):
+    """
+    SoundFile writing the audio format to `buffer`.
+    """
+    config = WAV_DATA_FORMAT if audio_format == "wav_data" else AUDIO_FORMATS[audio_format]
+    options = {}
+    if audio_format == "mp3":
+        options = {
+            "compression_level": compression_level(bitrate, mp3_bitrates(target_rate)),
+            "bitrate_mode": "CONSTANT",
+        }
+    elif audio_format == "opus":
+        options = {"compression_level": compression_level(bitrate, OPUS_BITRATES)}
+    return sf.SoundFile(
+        buffer,
+        "w",
+        samplerate=target_rate,
+        channels=channels,
+        format=config["format"],
+        subtype=config["subtype"],
+        endian=config.get("endian", "FILE"),
+        **options,
+    )
+
+
+def prepare(audio, sample_rate, target_rate, channels):
+    audio = resample(audio, sample_rate, target_rate)
+    if channels == 2:
+        audio = np.column_stack([audio, audio])
+    return audio
+
+
+def encode_audio(
+    audio, sample_rate, audio_format="mp3", target_rate=None, channels=1, bitrate=48
+):
+    """
+    Encode float audio samples in memory, `wav_data` giving the raw samples of a wav stream.
+    """
+    target_rate = target_rate or sample_rate
+    buffer = io.BytesIO()
+    with open_encoder(buffer, audio_format, target_rate, channels, bitrate) as encoder:
+        encoder.write(prepare(audio, sample_rate, target_rate, channels))
+    return buffer.getvalue()
+
+
+class StreamEncoder:
+    """
+    Single encoder for a whole streamed response, so the segments form one continuous
+    stream instead of chained files (chained ogg streams stop many players, chained mp3
+    repeat their encoder delay at each boundary).
+    `write` and `close` return the bytes encoded since the previous call.
+    """
+
+    def __init__(
+        self, sample_rate, audio_format="mp3", target_rate=None, channels=1, bitrate=48
+    ):
+        self.sample_rate = sample_rate
+        self.target_rate = target_rate or sample_rate
+        self.channels = channels
+        self.buffer = io.BytesIO()
+        self.encoder = open_encoder(
+            self.buffer, audio_format, self.target_rate, channels, bitrate
+        )
+        self.sent = 0
+
+    def _encoded(self):
+        data = self.buffer.getbuffer()[self.sent :].tobytes()
+        self.sent += len(data)
+        return data
+
+    def write(self, audio):
+        self.encoder.write(
+            prepare(audio, self.sample_rate, self.target_rate, self.channels)
+        )
+        return self._encoded()
+
+    def close(self):
+        self.encoder.close()
+        return self._encoded()
+
+
+def wav_stream_header(sample_rate, channels=1):
+    """
+    16 bits PCM wav header of unknown length, for wav audio streamed as raw PCM after it.
+    """
+    byte_rate = sample_rate * channels * 2
+    return b"".join(
+        [
+            b"RIFF",
+            struct.pack("<I", 0xFFFFFFFF),
+            b"WAVEfmt ",
+            struct.pack(
+                "<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, channels * 2, 16
+            ),
+            b"data",
+            struct.pack("<I", 0xFFFFFFFF),
+        ]
+    )
@@ -0,0 +1,84 @@
+import logging
+import os
+import re
+import time
+
+log = logging.getLogger(__name__)
+
+
+class DiskQuota:
+    """
+    Keep the files of `directories` under `max_bytes` in total,
+    deleting the least recently used ones first.
+    Only the files whose name matches `pattern` are deleted, never the dotfiles,
+    those younger than `min_age` seconds or starting with a protected prefix are kept.
+    """
+
+    def __init__(self, directories, max_bytes: int, pattern: str, min_age: float = 300):
+        self.directories = directories
+        self.max_bytes = max_bytes
+        self.pattern = re.compile(pattern)
+        self.min_age = min_age
+        self.reclaimed = 0
+        self.deleted = 0
+        self.occupancy = {}
+
+    def _files(self):
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        yield entry, entry.stat()
+                except OSError:
+                    pass
+
+    def collect(self, protected=()):
+        """
+        Delete files until under quota, return the reclaimed bytes.
+        """
+        files = list(self._files())
+        self.occupancy = {directory: 0 for directory in self.directories}
+        for entry, stat in files:
+            self.occupancy[os.path.dirname(entry.path)] += stat.st_size
+        size = sum(self.occupancy.values())
+        if size <= self.max_bytes:
+            return 0
+
+        now = time.time()
+        reclaimed = 0
+        for entry, stat in sorted(files, key=lambda file: file[1].st_mtime):
+            if size <= self.max_bytes:
+                break
+            if (
+                entry.name.startswith(".")
+                or not self.pattern.match(entry.name)
+                or now - stat.st_mtime < self.min_age
+                or entry.name.startswith(tuple(protected))
+            ):
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                log.warning(f"Failed deleting {entry.path}: {e}")
+                continue
+            log.debug(f"Deleted {entry.path} ({stat.st_size} bytes)")
+            size -= stat.st_size
+            reclaimed += stat.st_size
+            self.occupancy[os.path.dirname(entry.path)] -= stat.st_size
+            self.deleted += 1
+        self.reclaimed += reclaimed
+        if size > self.max_bytes:
+            log.warning(f"Files still over quota after collection: {size} bytes")
+        return reclaimed
+
+    def stats(self):
+        return {
+            "max_bytes": self.max_bytes,
+            "occupancy": self.occupancy,
+            "reclaimed": self.reclaimed,
+            "deleted": self.deleted,
+        }
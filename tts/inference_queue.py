@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+log = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceQueue:
+    """
+    Bounded queue of blocking inference jobs served by dedicated worker threads,
+    keeping them off the event loop.
+    Jobs cancelled or timed out before a worker picks them up are skipped,
+    a job already running completes but its result is dropped.
+    """
+
+    def __init__(self, name: str, workers: int = 1, max_size: int = 8):
+        self.name = name
+        self.workers = workers
+        self.jobs = queue.Queue(maxsize=max_size)
+        self.durations = deque(maxlen=50)
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.timeouts = 0
+        for index in range(workers):
+            threading.Thread(
+                target=self._work, name=f"{name}-worker-{index}", daemon=True
+            ).start()
+
+    def _work(self):
+        while True:
+            future, func, args, kwargs = self.jobs.get()
+            if not future.set_running_or_notify_cancel():
+                self.cancelled += 1
+                continue
+            self.running += 1
+            start = time.perf_counter()
+            try:
+                future.set_result(func(*args, **kwargs))
+                self.completed += 1
+            except BaseException as e:
+                future.set_exception(e)
+                self.failed += 1
+            finally:
+                self.durations.append(time.perf_counter() - start)
+                self.running -= 1
+
+    def depth(self) -> int:
+        return self.jobs.qsize()
+
+    def retry_after(self) -> int:
+        """
+        Estimated seconds before the queued jobs are done.
+        """
+        average = sum(self.durations) / len(self.durations) if self.durations else 1
+        return max(1, round((self.depth() + self.running) * average / self.workers))
+
+    async def run(self, func, *args, timeout: float = None, **kwargs):
+        """
+        Run `func` on a worker and wait for its result.
+        Raise QueueFull when the queue is full and asyncio.TimeoutError after `timeout` seconds.
+        """
+        future = Future()
+        try:
+            self.jobs.put_nowait((future, func, args, kwargs))
+        except queue.Full:
+            self.rejected += 1
+            raise QueueFull(self.retry_after())
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            future.cancel()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "depth": self.depth(),
+            "max_size": self.jobs.maxsize,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "timeouts": self.timeouts,
+            "average_duration": (
+                sum(self.durations) / len(self.durations) if self.durations else None
+            ),
+        }
@@ -1,13 +1,29 @@
 import logging
-from kokoro import KPipeline
-from IPython.display import display, Audio
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from kokoro import KModel, KPipeline
 import soundfile as sf
 
 log = logging.getLogger(__name__)
 
-log.info(f"Loading kokoro pipeline 'hexgrad/Kokoro-82M'")
+SAMPLE_RATE = 24000
+
+# Texts longer than this are split in sentences rendered concurrently on the worker pool.
+LONG_FORM_CHARS = int(os.getenv("TTS_LONG_FORM_CHARS", "600"))
+# Sentences are grouped in segments of about this size, to amortize the per segment cost.
+SEGMENT_CHARS = int(os.getenv("TTS_SEGMENT_CHARS", "200"))
+# Silence inserted between two segments, in seconds.
+SEGMENT_GAP = float(os.getenv("TTS_SEGMENT_GAP", "0.1"))
+WORKERS = int(os.getenv("TTS_WORKERS", "0"))
+WORKER_THREADS = int(os.getenv("TTS_WORKER_THREADS", "1"))
+
+REPO_ID = "hexgrad/Kokoro-82M"
+
 languages = {
-    'en': { 'code': 'a', 'voice': 'af_sarah', 'pipeline': KPipeline(lang_code='a', repo_id="hexgrad/Kokoro-82M")},
+    'en': { 'code': 'a', 'voice': 'af_sarah', 'pipeline': None},
     'es': { 'code': 'e', 'voice': '', 'pipeline': None},
     'fr': { 'code':'f', 'voice': 'ff_siwis', 'pipeline': None},
     'zh': { 'code': 'z', 'voice': 'zf_xiaoyi', 'pipeline': None},
@@ -21,15 +37,112 @@ def language_config(language):
         raise Exception(f"Language {language} not supported by kokoro.")
 
 
-def text_to_audio(text, file_path, language='en'):
+kokoro_model = None
+
+
+def get_model():
+    """
+    The kokoro model shared by all the language pipelines, loaded on CPU on first use.
+    """
+    global kokoro_model
+    if kokoro_model is None:
+        log.info(f"Loading kokoro model '{REPO_ID}'")
+        kokoro_model = KModel(repo_id=REPO_ID).eval()
+    return kokoro_model
+
+
+def generate_segments(text, language='en'):
+    """
+    Yield the audio of each text segment as soon as kokoro generates it.
+    """
     voice_config = language_config(language)
     if not voice_config.get('pipeline'):
-        languages[language]['pipeline'] = KPipeline(lang_code=voice_config['code'], repo_id="hexgrad/Kokoro-82M")
+        languages[language]['pipeline'] = KPipeline(lang_code=voice_config['code'], repo_id=REPO_ID, model=get_model())
     pipeline = voice_config['pipeline']
 
     generator = pipeline(text, voice=voice_config['voice'])
     for i, (gs, ps, audio) in enumerate(generator):
-        log.debug(i, gs, ps)
-        display(Audio(data=audio, rate=24000, autoplay=i==0))
-        sf.write(file_path, audio, 24000)
+        log.debug(f"Generated segment {i}: {gs} ({ps})")
+        if audio is not None:
+            yield np.asarray(audio, dtype=np.float32)
+
+
+def split_sentences(text, max_chars=SEGMENT_CHARS):
+    """
+    Split the text at sentence boundaries, grouping short sentences up to `max_chars`.
+    """
+    sentences = re.split(r'(?<=[.!?;。！？；])\s*', text)
+    segments = []
+    for sentence in filter(None, (sentence.strip() for sentence in sentences)):
+        if segments and len(segments[-1]) + len(sentence) < max_chars:
+            segments[-1] = f"{segments[-1]} {sentence}"
+        else:
+            segments.append(sentence)
+    return segments
+
+
+def init_worker(threads):
+    import torch
+
+    torch.set_num_threads(threads)
+
+
+def render_segment(text, language):
+    """
+    Render a whole text segment, run in the pool workers each holding its own kokoro pipelines.
+    """
+    segments = list(generate_segments(text, language))
+    return np.concatenate(segments) if segments else np.zeros(0, dtype=np.float32)
+
+
+worker_pool = None
+
+
+def get_worker_pool():
+    global worker_pool
+    if worker_pool is None:
+        log.info(f"Starting {WORKERS} kokoro workers")
+        # Spawned workers do not inherit the parent CUDA state.
+        worker_pool = ProcessPoolExecutor(
+            max_workers=WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(WORKER_THREADS,),
+        )
+    return worker_pool
+
+
+def renders_on_workers(text):
+    """
+    Whether the text is rendered by the worker pool processes, on their own models.
+    """
+    return WORKERS >= 1 and len(text) >= LONG_FORM_CHARS
+
+
+def audio_segments(text, language='en'):
+    """
+    Yield the text audio in order, long texts being rendered sentence groups
+    concurrently on the worker pool with a short silence between them.
+    """
+    if not renders_on_workers(text):
+        yield from generate_segments(text, language)
+        return
+
+    segments = split_sentences(text)
+    log.debug(f"Rendering {len(segments)} segments on the worker pool")
+    gap = np.zeros(int(SEGMENT_GAP * SAMPLE_RATE), dtype=np.float32)
+    results = get_worker_pool().map(render_segment, segments, [language] * len(segments))
+    for index, audio in enumerate(results):
+        if index:
+            yield gap
+        yield audio
+
+
+def synthesize(text, language='en'):
+    segments = list(audio_segments(text, language))
+    return np.concatenate(segments) if segments else np.zeros(0, dtype=np.float32)
+
+
+def text_to_audio(text, file_path, language='en'):
+    sf.write(file_path, synthesize(text, language), SAMPLE_RATE)
     return file_path
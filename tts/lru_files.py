@@ -0,0 +1,40 @@
+import os
+
+
+def touch(path: str):
+    """
+    Mark the file as recently used, raise OSError when it is gone.
+    The files modification time is their last use, eviction removes the oldest first.
+    """
+    os.utime(path)
+
+
+def directory_size(directory: str) -> int:
+    return sum(
+        entry.stat().st_size for entry in os.scandir(directory) if entry.is_file()
+    )
+
+
+def evict(directory: str, size: int, max_bytes: int):
+    """
+    Remove the least recently used files of `directory` until its `size` fits in `max_bytes`,
+    the temporary files being written are kept. Return the new size and the removed count.
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                entries.append((entry, entry.stat()))
+        except OSError:
+            pass
+    removed = 0
+    for entry, stat in sorted(entries, key=lambda file: file[1].st_mtime):
+        if size <= max_bytes:
+            break
+        try:
+            os.remove(entry.path)
+        except OSError:
+            continue
+        size -= stat.st_size
+        removed += 1
+    return size, removed
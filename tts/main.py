@@ -1,22 +1,52 @@
 import asyncio
+import contextlib
+import hashlib
+import json
+import queue
 import logging
 import os
 import subprocess
 import sys
+import time
 from time import sleep
-from typing import Annotated, Union
+from typing import Annotated, List, Union
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-import aiofiles
 import requests
+import torch
 import whisper
 import whisper_timestamped
+from audio_cache import AudioCache
+from audio_encoding import (
+    StreamEncoder,
+    encode_audio,
+    media_type,
+    validate_format,
+    wav_stream_header,
+)
 from bson import ObjectId
-from fastapi import FastAPI, File, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from disk_quota import DiskQuota
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from kokoro_tts import text_to_audio
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from inference_queue import InferenceQueue, QueueFull
+from kokoro_tts import (
+    SAMPLE_RATE,
+    audio_segments,
+    get_model,
+    language_config,
+    renders_on_workers,
+    synthesize,
+)
+from lru_files import touch
+from micro_batcher import MicroBatcher
+from model_residency import ModelResidency
 from pydantic import BaseModel
+from subtitles import srt_cue, transcribe_segmented
+from task_store import TaskStore
+from upload_ingest import load_audio, read_upload, spool_upload
 from whisper_timestamped.make_subtitles import write_srt
 
 logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
@@ -26,7 +56,9 @@ debug = os.getenv("DEBUG", "").lower() in ["1", "true"]
 
 app = FastAPI()
 
-tasks = {}
+TASKS_MAX_ENTRIES = int(os.getenv("TTS_TASKS_MAX_ENTRIES", "256"))
+TASKS_TTL = float(os.getenv("TTS_TASKS_TTL", str(24 * 3600)))
+tasks = TaskStore(TASKS_MAX_ENTRIES, TASKS_TTL)
 
 origins = ["http://localhost", "http://localhost:9000", "https://localhost"]
 if "HOST" in os.environ:
@@ -41,17 +73,47 @@ app.add_middleware(
 
 
 # FIXME Need to check the quality/speed we want.
-DEFAULT_MODEL = "small"
-log.info(f"Loading whisper model {DEFAULT_MODEL} on CPU (moved to GPU per request)")
-STT_MODEL = whisper.load_model(DEFAULT_MODEL)  # keep on CPU by default
-
+STT_MODEL_NAME = "small"
 SUBTITLES_MODEL_NAME = "openai/whisper-large-v2"
-log.info(
-    f"Loading subtitles Whisper model {SUBTITLES_MODEL_NAME} on CPU (moved to GPU per task)"
-)
-SUBTITLES_MODEL = whisper_timestamped.load_model(
-    SUBTITLES_MODEL_NAME, device="cpu"
-)
+
+# Accelerator memory available to the models, 0 uses 80% of the device memory.
+MODELS_BUDGET_MB = int(os.getenv("TTS_MODELS_BUDGET_MB", "0"))
+# Idle models are moved back to CPU after this many seconds.
+MODELS_IDLE_OFFLOAD = float(os.getenv("TTS_MODELS_IDLE_OFFLOAD", "300"))
+residency = ModelResidency(MODELS_BUDGET_MB * 1024 * 1024, MODELS_IDLE_OFFLOAD)
+# Whisper hooks its decoder while decoding, so each stt worker uses its own model copy.
+STT_WORKERS = int(os.getenv("TTS_STT_WORKERS", "1"))
+stt_models = queue.Queue()
+for index in range(STT_WORKERS):
+    residency.register(
+        f"stt-{index}", lambda: whisper.load_model(STT_MODEL_NAME, device="cpu")
+    )
+    stt_models.put(f"stt-{index}")
+# Speech regions of a video transcribed concurrently, whisper timestamped also hooks the
+# model so each worker uses its own copy.
+SUBTITLES_WORKERS = int(os.getenv("TTS_SUBTITLES_WORKERS", "1"))
+subtitles_models = queue.Queue()
+for index in range(SUBTITLES_WORKERS):
+    residency.register(
+        f"subtitles-{index}",
+        lambda: whisper_timestamped.load_model(SUBTITLES_MODEL_NAME, device="cpu"),
+    )
+    subtitles_models.put(f"subtitles-{index}")
+subtitles_pool = ThreadPoolExecutor(SUBTITLES_WORKERS, thread_name_prefix="subtitles")
+residency.register("kokoro", get_model)
+
+
+@contextlib.contextmanager
+def lease_copy(models: queue.Queue):
+    """
+    Lease a free copy of a model, a copy is used by one call at a time.
+    """
+    name = models.get()
+    try:
+        with residency.lease(name) as model:
+            yield model
+    finally:
+        models.put(name)
 
 MODELS_FOLDER = "/root/.local/share/tts"
 DEFAULT_MODEL = "tts_models/en/ljspeech/fast_pitch"
@@ -81,32 +143,88 @@ class TTSRequest(BaseModel):
     model: str = "kokoro-82M"  # "tts_models/en/ljspeech/fast_pitch"
     vocoder: str = "vocoder_models/en/ljspeech/hifigan_v2"
     language: str = "en"
+    # Send each sentence audio as soon as it is generated.
+    stream: bool = False
+    # Also write the output file in /app/tts/output.
+    keep: bool = False
+    # mp3, opus (in ogg), wav or pcm (raw 16 bits big endian, audio/L16), speech tuned defaults.
+    format: str = "mp3"
+    sample_rate: int = SAMPLE_RATE
+    channels: int = 1
+    # In kbps, for the mp3 and opus formats.
+    bitrate: int = 48
+
+
+def kokoro_lease(sentence):
+    """
+    Lease the in process kokoro model, unless the worker pool renders the sentence.
+    """
+    if renders_on_workers(sentence):
+        return contextlib.nullcontext()
+    return residency.lease("kokoro")
 
 
-def convert_to_mp3(filename, delete=True):
+def stream_audio(sentence, language, query, on_complete=None):
     """
-    ffmpeg -i input.wav -vn -ar 44100 -ac 2 -b:a 192k output.mp3
+    Yield the encoded audio of each segment as soon as kokoro generates it.
+    `on_complete` is called with the whole audio once generated.
     """
-    output = filename.replace(".wav", ".mp3")
-    command = (
-        f"ffmpeg -hwaccel cuda -y -i {filename} -vn -ar 44100 -ac 2 -b:a 192k {output}"
+    start = time.perf_counter()
+    chunks = []
+    if query.format == "wav":
+        chunks.append(wav_stream_header(query.sample_rate, query.channels))
+        yield chunks[0]
+    # Wav is streamed as a single header followed by raw samples.
+    encoder = StreamEncoder(
+        SAMPLE_RATE,
+        "wav_data" if query.format == "wav" else query.format,
+        query.sample_rate,
+        query.channels,
+        query.bitrate,
     )
-    log.info(f"Executing `{command}`")
-    try:
-        process = subprocess.Popen(command.split(" "))
-        process.wait()
-        if delete:
-            os.remove(filename)
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"Error converting audio to mp3: {e}")
-    return output
+    duration = 0
+    with kokoro_lease(sentence):
+        for index, audio in enumerate(audio_segments(sentence, language)):
+            duration += len(audio) / SAMPLE_RATE
+            chunk = encoder.write(audio)
+            if index == 0:
+                log.info(f"TTS first audio after {time.perf_counter() - start:.3f}s")
+            if chunk:
+                chunks.append(chunk)
+                yield chunk
+    chunk = encoder.close()
+    if chunk:
+        chunks.append(chunk)
+        yield chunk
+
+    record_real_time_factor(time.perf_counter() - start, duration)
+    if on_complete:
+        on_complete(b"".join(chunks))
+
+
+real_time_factors = deque(maxlen=100)
+
+
+def record_real_time_factor(synthesis_time, audio_duration):
+    """
+    Log the synthesis time over the generated audio duration, under 1 is faster than real time.
+    """
+    factor = synthesis_time / audio_duration if audio_duration else 0
+    real_time_factors.append(factor)
+    log.info(
+        f"TTS synthesized {audio_duration:.1f}s of audio in {synthesis_time:.1f}s (RTF {factor:.2f})"
+    )
+    return round(factor, 3)
 
 
 def clean_input(sentence):
     return sentence.replace('"', "").replace("'", "").replace("\n", "")
 
 
-subtitles_ids = {".en": "eng", ".fr": "fra", ".zh": "chi", ".sp": "spa"}
+subtitles_ids = {".en": "eng", ".fr": "fra", ".zh": "chi", ".es": "spa", ".sp": "spa"}
+# Languages translated by argos and labelled by subtitles_ids when embedded.
+SUBTITLES_LANGUAGES = ["en", "fr", "zh", "es"]
+TRANSLATION_WORKERS = int(os.getenv("TTS_TRANSLATION_WORKERS", "4"))
 
 
 def get_subtitles_language(subtitles_file):
@@ -114,15 +232,27 @@ def get_subtitles_language(subtitles_file):
     return subtitles_ids.get(ext)
 
 
-def embed_subtitles(video_file, subtitles_file, output_video_file):
-    subtitle_options = f"-map 1:s"
-    lang = get_subtitles_language(subtitles_file)
-    if lang:
-        subtitle_options += f" -metadata:s:s:0 language={lang}"
-    command = f"ffmpeg -i {video_file} -i {subtitles_file} -map 0:v -map 0:a -c:v copy -c:a copy -c:s mov_text {subtitle_options} {output_video_file}"
-    log.info(f"Executing `{command}`")
+def embed_subtitles(video_file, subtitles_files, output_video_file):
+    """
+    Mux all the subtitles files as tracks of the video in a single ffmpeg pass.
+    """
+    inputs = ["-i", video_file]
+    maps = ["-map", "0:v", "-map", "0:a"]
+    metadata = []
+    for index, subtitles_file in enumerate(subtitles_files):
+        inputs += ["-i", subtitles_file]
+        maps += ["-map", f"{index + 1}:s"]
+        lang = get_subtitles_language(subtitles_file)
+        if lang:
+            metadata += [f"-metadata:s:s:{index}", f"language={lang}"]
+    command = (
+        ["ffmpeg", *inputs, *maps, "-c:v", "copy", "-c:a", "copy", "-c:s", "mov_text"]
+        + metadata
+        + [output_video_file]
+    )
+    log.info(f"Executing `{' '.join(command)}`")
     try:
-        subprocess.run(command.split(" "), check=True)
+        subprocess.run(command, check=True)
         log.debug("FFmpeg subtitles integration executed successfully.")
     except subprocess.CalledProcessError as e:
         raise Exception(f"Error embedding subtitles in input video: {e}")
@@ -140,79 +270,182 @@ def burn_subtitles(video_file, subtitles_file, output_video_file):
     return output_video_file
 
 
-def _clear_cuda_cache(context: str = "") -> None:
-    """Best-effort VRAM cleanup after heavy GPU work."""
-    try:
-        import torch
+async def offload_idle_models():
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(max(MODELS_IDLE_OFFLOAD / 4, 5))
+        try:
+            await loop.run_in_executor(None, residency.offload_idle)
+        except Exception as e:
+            log.warning(f"Failed offloading idle models: {e}")
 
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-            log.debug(f"Cleared CUDA cache after {context}.")
-    except Exception as e:  # pragma: no cover - defensive
-        log.debug(f"Unable to clear CUDA cache after {context}: {e}")
 
+@app.on_event("startup")
+async def start_models_janitor():
+    asyncio.create_task(offload_idle_models())
 
-@app.post("/stt")
-async def create_upload_file(file: UploadFile, language: str = ""):
-    temp_file = f"/app/tts/input/input_{ObjectId()}_{file.filename}"
 
-    async with aiofiles.open(temp_file, "wb") as out_file:
-        content = await file.read()
-        await out_file.write(content)
+STT_QUEUE_SIZE = int(os.getenv("TTS_STT_QUEUE_SIZE", "8"))
+STT_TIMEOUT = float(os.getenv("TTS_STT_TIMEOUT", "300"))
+stt_queue = InferenceQueue("stt", STT_WORKERS, STT_QUEUE_SIZE)
 
-    language_code = stt_language.get(language) if language else None
 
-    # Move model to GPU just for this request, then offload back to CPU.
-    global STT_MODEL
-    try:
-        STT_MODEL = STT_MODEL.to("cuda")
-        result = STT_MODEL.transcribe(temp_file, language=language_code)
-    finally:
-        try:
-            STT_MODEL = STT_MODEL.to("cpu")
-        except Exception as e:
-            log.debug(f"Failed to move STT_MODEL back to CPU: {e}")
-        _clear_cuda_cache("STT /stt")
+# Clips up to whisper 30 seconds window arriving within the batch window are decoded together.
+STT_MAX_BATCH = int(os.getenv("TTS_STT_MAX_BATCH", "8"))
+STT_BATCH_WINDOW = float(os.getenv("TTS_STT_BATCH_WINDOW", "0.05"))
+# Whisper transcribe defaults, for the batched clips.
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4
 
-    if not debug:
-        os.remove(temp_file)
-    return {"result": result["text"]}
 
+def run_stt(audio, **options):
+    with lease_copy(stt_models) as model:
+        return model.transcribe(audio, **options)
 
-@app.post("/transcribe")
-async def transcribe_file(file: UploadFile, language: str = ""):
-    temp_file = f"/app/tts/input/input_{ObjectId()}_{file.filename}"
 
-    async with aiofiles.open(temp_file, "wb") as out_file:
-        content = await file.read()
-        await out_file.write(content)
+def run_stt_batch(audios, language, task):
+    """
+    Decode short clips in one batch, each padded to whisper 30 seconds window.
+    Like transcribe, silent clips give no text and the poorly decoded ones are
+    transcribed again with the temperature fallback.
+    """
+    with lease_copy(stt_models) as model:
+        mel = torch.stack(
+            [
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(audio), model.dims.n_mels
+                )
+                for audio in audios
+            ]
+        ).to(model.device)
+        options = whisper.DecodingOptions(
+            language=language, task=task, fp16=model.device.type == "cuda"
+        )
+        results = whisper.decode(model, mel, options)
+
+        transcriptions = []
+        for audio, result in zip(audios, results):
+            if (
+                result.no_speech_prob > NO_SPEECH_THRESHOLD
+                and result.avg_logprob < LOGPROB_THRESHOLD
+            ):
+                transcriptions.append({"text": ""})
+            elif (
+                result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                or result.avg_logprob < LOGPROB_THRESHOLD
+            ):
+                transcriptions.append(
+                    model.transcribe(audio, language=language, task=task)
+                )
+            else:
+                transcriptions.append({"text": result.text.strip()})
+    return transcriptions
+
+
+async def decode_batch(key, audios):
+    language, task = key
+    # A clip alone in its window keeps the regular transcribe path.
+    if len(audios) == 1:
+        return [
+            await stt_queue.run(
+                run_stt, audios[0], timeout=STT_TIMEOUT, language=language, task=task
+            )
+        ]
+    return await stt_queue.run(
+        run_stt_batch, audios, language, task, timeout=STT_TIMEOUT
+    )
+
+
+stt_batcher = MicroBatcher(decode_batch, STT_MAX_BATCH, STT_BATCH_WINDOW)
+
+
+async def transcribe_audio(source, language=None, task="transcribe"):
+    loop = asyncio.get_event_loop()
+    audio = await loop.run_in_executor(None, load_audio, source)
+    if STT_MAX_BATCH > 1 and len(audio) <= whisper.audio.N_SAMPLES:
+        return await stt_batcher.submit((language, task), audio)
+    return await stt_queue.run(
+        run_stt, audio, timeout=STT_TIMEOUT, language=language, task=task
+    )
 
-    language_code = stt_language.get(language) if language else None
 
-    global STT_MODEL
+async def queue_stt(request: Request, source, **options):
+    """
+    Transcribe on the stt workers, dropping the job when the client goes away.
+    """
+    job = asyncio.ensure_future(transcribe_audio(source, **options))
     try:
-        STT_MODEL = STT_MODEL.to("cuda")
-        result = STT_MODEL.transcribe(
-            temp_file, language=language_code, task="translate"
+        while True:
+            done, _ = await asyncio.wait({job}, timeout=1)
+            if done:
+                return job.result()
+            if await request.is_disconnected():
+                log.info("Client disconnected, cancelling transcription")
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many transcriptions queued.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Transcription timed out.",
+            headers={"Retry-After": str(stt_queue.retry_after())},
         )
     finally:
-        try:
-            STT_MODEL = STT_MODEL.to("cpu")
-        except Exception as e:
-            log.debug(f"Failed to move STT_MODEL back to CPU after /transcribe: {e}")
-        _clear_cuda_cache("STT /transcribe")
+        job.cancel()
+
+
+# Uploads up to this size are decoded from memory, larger ones are spooled to disk.
+STT_MEMORY_BYTES = int(os.getenv("TTS_STT_MEMORY_BYTES", str(16 * 1024 * 1024)))
 
-    if not debug:
-        os.remove(temp_file)
+
+async def transcribe_upload(file: UploadFile, request: Request, **options):
+    spool_path = f"/app/tts/input/input_{ObjectId()}_{file.filename}"
+    source = await read_upload(file, STT_MEMORY_BYTES, spool_path)
+    try:
+        return await queue_stt(request, source, **options)
+    finally:
+        if isinstance(source, str) and not debug:
+            os.remove(spool_path)
+
+
+@app.post("/stt")
+async def create_upload_file(file: UploadFile, request: Request, language: str = ""):
+    language_code = stt_language.get(language) if language else None
+    result = await transcribe_upload(file, request, language=language_code)
     return {"result": result["text"]}
 
 
+@app.post("/transcribe")
+async def transcribe_file(file: UploadFile, request: Request, language: str = ""):
+    language_code = stt_language.get(language) if language else None
+    result = await transcribe_upload(
+        file, request, language=language_code, task="translate"
+    )
+    return {"result": result["text"]}
+
+
+TTS_CACHE_PATH = os.getenv("TTS_CACHE_PATH", "/app/tts/audio_cache")
+TTS_CACHE_BYTES = int(os.getenv("TTS_CACHE_BYTES", str(512 * 1024 * 1024)))
+audio_cache = AudioCache(TTS_CACHE_PATH, TTS_CACHE_BYTES)
+
+
+def keep_output(content, audio_format):
+    output_file = f"/app/tts/output/output_{ObjectId()}.{audio_format}"
+    with open(output_file, "wb") as f:
+        f.write(content)
+    log.debug(f"Kept tts output in {output_file}")
+
+
 @app.post("/tts")
-def readPost(query: TTSRequest):
+def readPost(query: TTSRequest, request: Request):
     """
-    Process the given input into audio convert in mp3 and returns it as a file.
+    Process the given input into audio encoded in memory in the requested format and returns it.
     """
-    output_wav = f"/app/tts/output/output_{ObjectId()}.wav"
     sentence = clean_input(query.sentence)
     language = "en"
     if hasattr(query, "language"):
@@ -226,18 +459,94 @@ def readPost(query: TTSRequest):
                 status_code=400, detail="Only kokoro TTS engine is supported."
             )
 
-    text_to_audio(text=sentence, file_path=output_wav, language=language)
-    output_mp3 = convert_to_mp3(output_wav)
+    format_error = validate_format(query.format, query.sample_rate)
+    if format_error or query.channels not in [1, 2]:
+        raise HTTPException(
+            status_code=400, detail=format_error or "Channels must be 1 or 2."
+        )
+    audio_type = media_type(query.format, query.sample_rate, query.channels)
+
+    cache_key = AudioCache.key(
+        sentence=sentence,
+        voice=language_config(language)["voice"],
+        language=language,
+        format=query.format,
+        sample_rate=query.sample_rate,
+        channels=query.channels,
+        bitrate=query.bitrate,
+        # Streamed audio comes from a single encoder like the non streamed one, only the
+        # streamed wav header differs, its length being unknown.
+        streamed_wav=query.stream and query.format == "wav",
+    )
+    headers = {"ETag": f'"{cache_key}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    def store_output(content):
+        audio_cache.put(cache_key, content)
+        if query.keep:
+            keep_output(content, query.format)
+
+    content = audio_cache.get(cache_key)
+    if content is not None:
+        log.debug(f"Serving cached audio {cache_key}")
+        if query.keep:
+            keep_output(content, query.format)
+        return Response(content=content, media_type=audio_type, headers=headers)
+
+    if query.stream:
+        return StreamingResponse(
+            stream_audio(
+                sentence,
+                language,
+                query,
+                store_output,
+            ),
+            media_type=audio_type,
+            headers=headers,
+        )
 
-    return FileResponse(output_mp3, media_type="audio/mpeg")
+    start = time.perf_counter()
+    with kokoro_lease(sentence):
+        audio = synthesize(sentence, language)
+    headers["X-Real-Time-Factor"] = str(
+        record_real_time_factor(time.perf_counter() - start, len(audio) / SAMPLE_RATE)
+    )
+    content = encode_audio(
+        audio,
+        SAMPLE_RATE,
+        query.format,
+        query.sample_rate,
+        query.channels,
+        query.bitrate,
+    )
+    store_output(content)
+
+    return Response(content=content, media_type=audio_type, headers=headers)
 
 
 @app.get("/tts")
-def readGet(query: TTSRequest):
+def readGet(query: TTSRequest, request: Request):
     """
     Process the given input into audio convert in mp3 and returns it as a file.
     """
-    return readPost(query)
+    return readPost(query, request)
+
+
+@app.get("/tts/stats")
+def tts_stats():
+    return {
+        "audio_cache": audio_cache.stats(),
+        "transcription_cache": transcription_cache.stats(),
+        "tasks": tasks.stats(),
+        "files": files_quota.stats(),
+        "models": residency.stats(),
+        "stt_queue": stt_queue.stats(),
+        "stt_batches": stt_batcher.stats(),
+        "average_real_time_factor": (
+            sum(real_time_factors) / len(real_time_factors) if real_time_factors else None
+        ),
+    }
 
 
 @app.get("/models")
@@ -247,75 +556,125 @@ def read_item():
     """
     return [{"hexgrad/Kokoro-82M": True}]
 
+def transcribe_subtitles(audio):
+    with lease_copy(subtitles_models) as model:
+        return whisper_timestamped.transcribe(model, audio, task="translate")
+
+
+TRANSCRIPTION_CACHE_PATH = os.getenv(
+    "TTS_TRANSCRIPTION_CACHE_PATH", "/app/tts/transcription_cache"
+)
+TRANSCRIPTION_CACHE_BYTES = int(
+    os.getenv("TTS_TRANSCRIPTION_CACHE_BYTES", str(256 * 1024 * 1024))
+)
+transcription_cache = AudioCache(TRANSCRIPTION_CACHE_PATH, TRANSCRIPTION_CACHE_BYTES)
+
+
+def publish_cues(task_id, segments):
+    """
+    Add the transcribed segments as srt cues to the task, for its websocket.
+    """
+    cues = tasks[task_id].setdefault("cues", [])
+    for segment in segments:
+        cues.append(srt_cue(len(cues) + 1, segment))
+
+
+def translate_subtitles(subtitles_file_en, filename_base, language):
+    if language == "en":
+        return subtitles_file_en
+    subtitles_file = f"/app/tts/output/{filename_base}.{language}.srt"
+    with open(subtitles_file_en, "rb") as f:
+        response = requests.post(
+            "http://argos-translate/translate_subtitles",
+            params={"from_code": "en", "to_code": language},
+            files={"file": f},
+            timeout=60,
+        )
+    if response.status_code != 200:
+        raise Exception(f"Translation to {language} failed")
+    with open(subtitles_file, "wb") as f:
+        f.write(response.content)
+    return subtitles_file
+
+
 def _run_subtitling_sync(
     task_id: str,
     temp_file: str,
-    language: str,
+    languages: List[str],
     integration: str,
     extension: str,
+    vad: bool = True,
 ) -> None:
     """Sync CPU-bound work (Whisper, FFmpeg) - runs in thread to keep event loop responsive."""
     filename_base = os.path.splitext(os.path.basename(temp_file))[0]
     output_video_file = f"/app/tts/output/{filename_base}{extension}"
     subtitles_file_en = f"/app/tts/output/{filename_base}.en.srt"
-    subtitles_file = f"/app/tts/output/{filename_base}.{language}.srt"
-
-    global SUBTITLES_MODEL
-    try:
-        # 1. Whisper Transcription (Heavy CUDA Task)
-        audio = whisper_timestamped.load_audio(temp_file)
-
-        # Move large subtitles model to GPU for this task, then back to CPU.
-        try:
-            SUBTITLES_MODEL = SUBTITLES_MODEL.to("cuda")  # type: ignore[attr-defined]
-        except Exception as e:
-            log.debug(f"Failed to move SUBTITLES_MODEL to GPU, staying on CPU: {e}")
 
-        result = whisper_timestamped.transcribe(SUBTITLES_MODEL, audio, task="translate")
-
-        with open(subtitles_file_en, "w", encoding="utf-8") as f:
-            write_srt(result["segments"], file=f)
-
-        # 2. Translation logic (Argos)
-        target_file = subtitles_file_en
-        if language != "en":
-            with open(subtitles_file_en, "rb") as f:
-                response = requests.post(
-                    "http://argos-translate/translate_subtitles",
-                    files={"file": f},
-                    timeout=60,
-                )
-            if response.status_code == 200:
-                with open(subtitles_file, "wb") as f:
-                    f.write(response.content)
-                target_file = subtitles_file
-            else:
-                raise Exception("Translation failed")
+    # 1. Whisper Transcription (Heavy CUDA Task)
+    audio = whisper_timestamped.load_audio(temp_file)
+    # Reruns on the same video only redo the translation and integration.
+    cache_key = AudioCache.key(
+        audio=hashlib.sha256(audio.tobytes()).hexdigest(),
+        model=SUBTITLES_MODEL_NAME,
+        task="translate",
+        vad=vad,
+    )
+    cached = transcription_cache.get(cache_key)
+    if cached is not None:
+        log.info(f"Using cached transcription for task {task_id}")
+        segments = json.loads(cached)
+        publish_cues(task_id, segments)
+    elif vad:
+        segments = transcribe_segmented(
+            audio,
+            transcribe_subtitles,
+            subtitles_pool,
+            lambda segments: publish_cues(task_id, segments),
+        )
+    else:
+        segments = transcribe_subtitles(audio)["segments"]
+    if cached is None:
+        transcription_cache.put(
+            cache_key, json.dumps(segments, default=float).encode("utf-8")
+        )
 
-        # 3. Integration logic (Embed/Burn)
-        final_path = target_file
-        if integration and extension in videos_types:
-            if integration == "embed":
-                final_path = embed_subtitles(temp_file, target_file, output_video_file)
-            elif integration == "burn":
-                final_path = burn_subtitles(temp_file, target_file, output_video_file)
+    with open(subtitles_file_en, "w", encoding="utf-8") as f:
+        write_srt(segments, file=f)
+
+    # 2. Translation logic (Argos), all the languages at once
+    with ThreadPoolExecutor(min(len(languages), TRANSLATION_WORKERS)) as pool:
+        target_files = list(
+            pool.map(
+                lambda language: translate_subtitles(
+                    subtitles_file_en, filename_base, language
+                ),
+                languages,
+            )
+        )
 
-        tasks[task_id] = {"status": "completed", "file_path": final_path}
-    finally:
-        # Offload subtitles model back to CPU and free VRAM.
-        try:
-            SUBTITLES_MODEL = SUBTITLES_MODEL.to("cpu")  # type: ignore[attr-defined]
-        except Exception as e:
-            log.debug(f"Failed to move SUBTITLES_MODEL back to CPU: {e}")
-        _clear_cuda_cache("subtitles generation")
+    # 3. Integration logic (Embed/Burn)
+    final_path = target_files[0]
+    if integration and extension in videos_types:
+        if integration == "embed":
+            final_path = embed_subtitles(temp_file, target_files, output_video_file)
+        elif integration == "burn":
+            # Only the first language can be burnt in the video.
+            final_path = burn_subtitles(temp_file, target_files[0], output_video_file)
+
+    tasks[task_id].update(
+        status="completed",
+        file_path=final_path,
+        subtitles_files=dict(zip(languages, target_files)),
+    )
 
 
 async def process_subtitling_task(
     task_id: str,
     temp_file: str,
-    language: str,
+    languages: List[str],
     integration: str,
     extension: str,
+    vad: bool = True,
 ) -> None:
     """Run heavy processing in thread so WebSocket can send updates (mirrors story-teller)."""
     loop = asyncio.get_event_loop()
@@ -323,42 +682,71 @@ async def process_subtitling_task(
         await loop.run_in_executor(
             None,
             lambda: _run_subtitling_sync(
-                task_id, temp_file, language, integration, extension
+                task_id, temp_file, languages, integration, extension, vad
             ),
         )
     except Exception as e:
         log.error(f"Task {task_id} failed: {str(e)}")
         tasks[task_id] = {"status": "failed", "error": str(e)}
+    finally:
+        if not debug and os.path.exists(temp_file):
+            os.remove(temp_file)
 
 @app.post("/stt/subtitles")
 async def get_subtitles(
-    file: UploadFile, language: str = "en", integration: str = None
+    file: UploadFile, language: str = "en", integration: str = None, vad: bool = True
 ):
+    """
+    Start a subtitles task, `language` being one or several comma separated languages,
+    all embedded as tracks of the video, the first one is the burnt or returned one.
+    With `vad` only the speech regions are transcribed, concurrently, their english cues
+    being sent on the task websocket as they are done.
+    """
+    languages = list(
+        dict.fromkeys(code.strip() for code in language.split(",") if code.strip())
+    ) or ["en"]
+    unsupported = [code for code in languages if code not in SUBTITLES_LANGUAGES]
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported languages {unsupported}, use some of {SUBTITLES_LANGUAGES}.",
+        )
     task_id = str(uuid.uuid4())
     _, extension = os.path.splitext(file.filename)
     temp_file = f"/app/tts/input/{task_id}_{file.filename}"
-
-    async with aiofiles.open(temp_file, "wb") as out_file:
-        content = await file.read()
-        await out_file.write(content)
+    await spool_upload(file, temp_file)
 
     tasks[task_id] = {"status": "processing"}
     log.info(
-        f"Accepted subtitles task {task_id} (language={language}, integration={integration}, filename={file.filename})"
+        f"Accepted subtitles task {task_id} (language={language}, integration={integration}, vad={vad}, filename={file.filename})"
     )
     asyncio.create_task(
-        process_subtitling_task(task_id, temp_file, language, integration, extension)
+        process_subtitling_task(
+            task_id, temp_file, languages, integration, extension, vad
+        )
     )
     return {"task_id": task_id, "status": "accepted"}
 
 @app.get("/stt/status/{task_id}")
-async def check_status(task_id: str):
+async def check_status(task_id: str, language: str = ""):
+    """
+    Return the task result once completed, or the subtitles of the given `language`.
+    """
     task = tasks.get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
     if task["status"] == "completed":
-        return FileResponse(task["file_path"])
+        file_path = task["file_path"]
+        if language:
+            if language not in task["subtitles_files"]:
+                raise HTTPException(status_code=404, detail="Language not found")
+            file_path = task["subtitles_files"][language]
+        try:
+            touch(file_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=410, detail="Task result was deleted")
+        return FileResponse(file_path)
 
     return task
 
@@ -367,10 +755,11 @@ async def check_status(task_id: str):
 async def subtitles_websocket(websocket: WebSocket, task_id: str):
     """
     WebSocket endpoint to wait for subtitle task completion.
-    sends status updates until complete or error.
+    sends status updates and the english srt cues as they are transcribed until complete or error.
     """
     await websocket.accept()
     last_status = None
+    sent_cues = 0
 
     try:
         while True:
@@ -387,6 +776,13 @@ async def subtitles_websocket(websocket: WebSocket, task_id: str):
             task = tasks[task_id]
             status = task["status"]
 
+            cues = task.get("cues", [])
+            if len(cues) > sent_cues:
+                await websocket.send_json(
+                    {"status": "cues", "language": "en", "cues": cues[sent_cues:]}
+                )
+                sent_cues = len(cues)
+
             # Send update when status changes
             if last_status is None or last_status != status:
                 if status == "completed":
@@ -413,3 +809,39 @@ async def subtitles_websocket(websocket: WebSocket, task_id: str):
     except Exception as e:
         log.exception(f"WebSocket error for task {task_id}")
         await websocket.send_json({"status": "error", "message": str(e)})
+
+
+FILES_QUOTA_BYTES = int(os.getenv("TTS_FILES_QUOTA_BYTES", str(10 * 1024**3)))
+FILES_JANITOR_INTERVAL = float(os.getenv("TTS_FILES_JANITOR_INTERVAL", "60"))
+# Only the request and task artifacts are collected: input_*, output_* and {task_id}_*.
+TASK_FILES_PATTERN = r"(input_|output_|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_)"
+files_quota = DiskQuota(
+    ["/app/tts/input", "/app/tts/output"], FILES_QUOTA_BYTES, TASK_FILES_PATTERN
+)
+
+
+async def collect_files():
+    """
+    Expire the old tasks and delete the least recently used files over the quota,
+    keeping the ones of the tasks still processing.
+    """
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            tasks.evict()
+            protected = [
+                f"{task_id}_"
+                for task_id, task in tasks.items()
+                if task["status"] == "processing"
+            ]
+            reclaimed = await loop.run_in_executor(None, files_quota.collect, protected)
+            if reclaimed:
+                log.info(f"Reclaimed {reclaimed} bytes of tts files")
+        except Exception as e:
+            log.warning(f"Failed collecting tts files: {e}")
+        await asyncio.sleep(FILES_JANITOR_INTERVAL)
+
+
+@app.on_event("startup")
+async def start_files_janitor():
+    asyncio.create_task(collect_files())
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+log = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Group the items submitted within `window` seconds under the same key in one batch,
+    up to `max_batch` items, run by `run_batch(key, items)` returning one result per item.
+    """
+
+    def __init__(self, run_batch, max_batch: int = 8, window: float = 0.05):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.window = window
+        self.pending = {}
+        self.batch_stats = defaultdict(
+            lambda: {"batches": 0, "items": 0, "run_time": 0.0, "latency": 0.0}
+        )
+
+    async def submit(self, key, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if key not in self.pending:
+            timer = loop.call_later(self.window, self._flush, key)
+            self.pending[key] = ([], timer)
+        batch, _ = self.pending[key]
+        batch.append((item, future, time.perf_counter()))
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key):
+        batch, timer = self.pending.pop(key, (None, None))
+        if not batch:
+            return
+        timer.cancel()
+        asyncio.ensure_future(self._run(key, batch))
+
+    async def _run(self, key, batch):
+        # Waiters gone while the batch was collected are not run.
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            results = await self.run_batch(key, [item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        end = time.perf_counter()
+        stats = self.batch_stats[len(batch)]
+        stats["batches"] += 1
+        stats["items"] += len(batch)
+        stats["run_time"] += end - start
+        for (_, future, submitted), result in zip(batch, results):
+            stats["latency"] += end - submitted
+            if not future.done():
+                future.set_result(result)
+        log.debug(f"Ran a batch of {len(batch)} in {end - start:.3f}s")
+
+    def stats(self):
+        return {
+            "max_batch": self.max_batch,
+            "window": self.window,
+            "batch_sizes": {
+                size: {
+                    "batches": stats["batches"],
+                    "items_per_second": (
+                        stats["items"] / stats["run_time"] if stats["run_time"] else None
+                    ),
+                    "average_latency": stats["latency"] / stats["items"],
+                }
+                for size, stats in sorted(self.batch_stats.items())
+            },
+        }
@@ -0,0 +1,237 @@
+import contextlib
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+def model_size(model) -> int:
+    """
+    Memory used by the model weights, in bytes.
+    """
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def clear_cuda_cache(context: str = ""):
+    """Best-effort VRAM cleanup after heavy GPU work."""
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+            log.debug(f"Cleared CUDA cache after {context}.")
+    except Exception as e:  # pragma: no cover - defensive
+        log.debug(f"Unable to clear CUDA cache after {context}: {e}")
+
+
+class ManagedModel:
+    def __init__(self, name: str, loader):
+        self.name = name
+        self.loader = loader
+        self.model = None
+        self.device = None
+        self.size = 0
+        self.leases = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.load_time = 0.0
+        self.transfers = 0
+        self.transfer_time = 0.0
+        self.lock = threading.Lock()
+
+
+class ModelResidency:
+    """
+    Keeps the models on the accelerator within a memory budget.
+
+    Models are loaded on CPU on first use, then moved to the accelerator when leased,
+    offloading the least recently used idle ones when over budget.
+    A leased model is never moved, idle ones are offloaded after `idle_offload` seconds.
+    Without accelerator the models simply stay on CPU.
+    """
+
+    def __init__(self, budget: int = 0, idle_offload: float = 300, accelerator=None):
+        self.accelerator = accelerator
+        self.budget = budget
+        self.idle_offload = idle_offload
+        self.models = {}
+        self.lock = threading.Lock()
+
+        if self.accelerator is None:
+            try:
+                import torch
+
+                if torch.cuda.is_available():
+                    self.accelerator = "cuda"
+                    if not self.budget:
+                        total = torch.cuda.get_device_properties(0).total_memory
+                        self.budget = int(total * 0.8)
+            except ImportError:
+                pass
+        log.info(f"Model residency on {self.accelerator or 'cpu'}, budget {self.budget}")
+
+    def register(self, name: str, loader):
+        """
+        Declare a model, `loader` returns it on CPU when first used.
+        """
+        self.models[name] = ManagedModel(name, loader)
+
+    def _move(self, entry: ManagedModel, device: str):
+        start = time.perf_counter()
+        entry.model = entry.model.to(device)
+        entry.device = device
+        entry.transfers += 1
+        entry.transfer_time += time.perf_counter() - start
+        log.debug(f"Moved {entry.name} to {device} in {time.perf_counter() - start:.2f}s")
+
+    def _resident_size(self) -> int:
+        return sum(
+            entry.size
+            for entry in self.models.values()
+            if entry.device == self.accelerator
+        )
+
+    def _claim_idle(self, candidates):
+        """
+        Lock the candidates not leased nor being loaded or moved, under the global lock.
+        """
+        claimed = []
+        for entry in candidates:
+            if entry.leases == 0 and entry.lock.acquire(blocking=False):
+                claimed.append(entry)
+        return claimed
+
+    def _plan_placement(self, entry: ManagedModel):
+        """
+        Reserve the accelerator room for the entry, return the idle models to offload
+        for it, locked, or None when it does not fit.
+        """
+        with self.lock:
+            resident = self._resident_size()
+            candidates = sorted(
+                (
+                    other
+                    for other in self.models.values()
+                    if other is not entry and other.device == self.accelerator
+                ),
+                key=lambda other: other.last_used,
+            )
+            victims = []
+            for victim in self._claim_idle(candidates):
+                if resident + entry.size <= self.budget:
+                    victim.lock.release()
+                    continue
+                victims.append(victim)
+                resident -= victim.size
+            if resident + entry.size > self.budget:
+                for victim in victims:
+                    victim.lock.release()
+                return None
+            # Planned placement, the transfers are done outside of the global lock.
+            for victim in victims:
+                victim.device = "cpu"
+            entry.device = self.accelerator
+            return victims
+
+    def _load(self, entry: ManagedModel):
+        start = time.perf_counter()
+        log.info(f"Loading model {entry.name}")
+        model = entry.loader()
+        with self.lock:
+            entry.model = model
+            entry.device = "cpu"
+            entry.size = model_size(model)
+            entry.loads += 1
+            entry.load_time += time.perf_counter() - start
+
+    def _acquire(self, name: str):
+        entry = self.models[name]
+        # The entry lock serializes its load and transfers, the global lock only guards the
+        # bookkeeping so other models are leased meanwhile.
+        with entry.lock:
+            if entry.model is None:
+                self._load(entry)
+
+            if self.accelerator and entry.device != self.accelerator and not entry.leases:
+                victims = self._plan_placement(entry)
+                if victims is None:
+                    log.info(f"No accelerator room for {name}, running on CPU")
+                else:
+                    try:
+                        for victim in victims:
+                            self._move(victim, "cpu")
+                    finally:
+                        for victim in victims:
+                            victim.lock.release()
+                    if victims:
+                        clear_cuda_cache("offloading models")
+                    try:
+                        self._move(entry, self.accelerator)
+                    except Exception as e:
+                        log.warning(f"Failed moving {name} to {self.accelerator}: {e}")
+                        self._move(entry, "cpu")
+                        clear_cuda_cache(f"failing to move {name}")
+            with self.lock:
+                entry.leases += 1
+        return entry
+
+    def _release(self, entry: ManagedModel):
+        with self.lock:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+
+    @contextlib.contextmanager
+    def lease(self, name: str):
+        """
+        Use the model, on the accelerator when it fits, it is not moved until released.
+        """
+        entry = self._acquire(name)
+        try:
+            yield entry.model
+        finally:
+            self._release(entry)
+
+    def offload_idle(self):
+        """
+        Move back to CPU the models unused for `idle_offload` seconds.
+        """
+        if not self.accelerator:
+            return
+        with self.lock:
+            now = time.monotonic()
+            idle = self._claim_idle(
+                entry
+                for entry in self.models.values()
+                if entry.device == self.accelerator
+                and now - entry.last_used > self.idle_offload
+            )
+        try:
+            for entry in idle:
+                self._move(entry, "cpu")
+        finally:
+            for entry in idle:
+                entry.lock.release()
+        if idle:
+            clear_cuda_cache("idle offload")
+
+    def stats(self):
+        return {
+            "accelerator": self.accelerator,
+            "budget": self.budget,
+            "resident": self._resident_size(),
+            "models": {
+                entry.name: {
+                    "loaded": entry.model is not None,
+                    "device": entry.device,
+                    "size": entry.size,
+                    "leases": entry.leases,
+                    "loads": entry.loads,
+                    "load_time": entry.load_time,
+                    "transfers": entry.transfers,
+                    "transfer_time": entry.transfer_time,
+                }
+                for entry in self.models.values()
+            },
+        }
@@ -0,0 +1,111 @@
+import logging
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+def speech_regions(
+    audio,
+    sample_rate=SAMPLE_RATE,
+    threshold_db=-45.0,
+    min_silence=1.0,
+    min_speech=0.25,
+    padding=0.2,
+    max_length=60.0,
+    frame=0.03,
+):
+    """
+    Energy based voice activity detection, return the (start, end) sample ranges with speech.
+    Ranges closer than `min_silence` seconds are merged and the ones longer than `max_length`
+    seconds are cut at their quietest frame near the limit, without padding at the cuts.
+    """
+    frame_length = int(frame * sample_rate)
+    count = len(audio) // frame_length
+    if not count:
+        return []
+    frames = audio[: count * frame_length].reshape(count, frame_length)
+    levels = 20 * np.log10(np.sqrt(np.mean(frames**2, axis=1)) + 1e-10)
+    voiced = np.flatnonzero(levels > threshold_db)
+
+    regions = []
+    gap = int(min_silence / frame)
+    for index in voiced.tolist():
+        if regions and index - regions[-1][1] <= gap:
+            regions[-1][1] = index + 1
+        else:
+            regions.append([index, index + 1])
+
+    max_frames = int(max_length / frame)
+    pad = int(padding * sample_rate)
+    split = []
+    for start, end in regions:
+        if (end - start) * frame < min_speech:
+            continue
+        start_sample = max(0, start * frame_length - pad)
+        while end - start > max_frames:
+            window = levels[start + int(max_frames * 0.8) : start + max_frames]
+            cut = start + int(max_frames * 0.8) + int(np.argmin(window))
+            split.append((start_sample, cut * frame_length))
+            start, start_sample = cut, cut * frame_length
+        split.append((start_sample, min(len(audio), end * frame_length + pad)))
+    return split
+
+
+def shift_segments(segments, offset):
+    """
+    Move the segments and their words timestamps by `offset` seconds.
+    """
+    for segment in segments:
+        segment["start"] += offset
+        segment["end"] += offset
+        for word in segment.get("words", []):
+            word["start"] += offset
+            word["end"] += offset
+    return segments
+
+
+def srt_timestamp(seconds):
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+def srt_cue(index, segment):
+    return (
+        f"{index}\n{srt_timestamp(segment['start'])} --> {srt_timestamp(segment['end'])}\n"
+        f"{segment['text'].strip()}\n"
+    )
+
+
+def transcribe_segmented(audio, transcribe, pool, on_segments=None, **vad_options):
+    """
+    Transcribe the speech regions of the audio concurrently on `pool`,
+    `transcribe(audio)` returning the whisper result of a region.
+    `on_segments` is called in timeline order with the segments of each region once done.
+    Return all the segments on the audio timeline.
+    """
+    regions = speech_regions(audio, **vad_options)
+    speech = sum(end - start for start, end in regions)
+    log.info(
+        f"Transcribing {len(regions)} speech regions, {speech / SAMPLE_RATE:.0f}s "
+        f"out of {len(audio) / SAMPLE_RATE:.0f}s of audio"
+    )
+    futures = [pool.submit(transcribe, audio[start:end]) for start, end in regions]
+    segments = []
+    try:
+        for (start, _), future in zip(regions, futures):
+            region_segments = shift_segments(
+                future.result()["segments"], start / SAMPLE_RATE
+            )
+            segments += region_segments
+            if on_segments:
+                on_segments(region_segments)
+    finally:
+        for future in futures:
+            future.cancel()
+    return segments
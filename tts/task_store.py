@@ -0,0 +1,61 @@
+import logging
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class TaskStore:
+    """
+    Registry of the subtitles tasks, dict-like.
+    Finished tasks expire `ttl` seconds after they ended and the oldest finished ones
+    are dropped once over `max_entries`, tasks still processing are always kept.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.tasks: OrderedDict = OrderedDict()
+        self.finished = {}
+        self.expired = 0
+
+    def __setitem__(self, task_id, task):
+        self.tasks[task_id] = task
+        self.tasks.move_to_end(task_id)
+        self.evict()
+
+    def __getitem__(self, task_id):
+        return self.tasks[task_id]
+
+    def __contains__(self, task_id):
+        return task_id in self.tasks
+
+    def get(self, task_id, default=None):
+        return self.tasks.get(task_id, default)
+
+    def items(self):
+        return list(self.tasks.items())
+
+    def evict(self):
+        now = time.monotonic()
+        finished = []
+        for task_id, task in self.tasks.items():
+            if task["status"] != "processing":
+                finished.append(task_id)
+                self.finished.setdefault(task_id, now)
+        excess = len(self.tasks) - self.max_entries
+        for task_id in finished:
+            if excess > 0 or now - self.finished[task_id] > self.ttl:
+                log.debug(f"Expiring task {task_id}")
+                del self.tasks[task_id]
+                del self.finished[task_id]
+                self.expired += 1
+                excess -= 1
+
+    def stats(self):
+        return {
+            "size": len(self.tasks),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "expired": self.expired,
+        }
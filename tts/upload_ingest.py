@@ -0,0 +1,113 @@
+import logging
+import os
+import subprocess
+import tempfile
+
+import aiofiles
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+WHISPER_SAMPLE_RATE = 16000
+
+# Mp4 family containers may have their index (moov atom) at the end, ffmpeg can not
+# read them from a pipe.
+SEEKABLE_EXTENSIONS = [".mp4", ".m4a", ".m4v", ".mov", ".3gp", ".3g2"]
+SEEKABLE_CONTENT_TYPES = [
+    "video/mp4",
+    "audio/mp4",
+    "audio/x-m4a",
+    "video/quicktime",
+    "video/3gpp",
+    "audio/3gpp",
+]
+
+
+def needs_seeking(file) -> bool:
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    return (
+        extension in SEEKABLE_EXTENSIONS
+        or (file.content_type or "").split(";")[0] in SEEKABLE_CONTENT_TYPES
+    )
+
+
+async def spool_upload(file, path: str) -> int:
+    """
+    Copy the upload to `path` chunk by chunk, return its size.
+    """
+    size = 0
+    async with aiofiles.open(path, "wb") as out_file:
+        while chunk := await file.read(CHUNK_SIZE):
+            await out_file.write(chunk)
+            size += len(chunk)
+    return size
+
+
+async def read_upload(file, max_memory: int, spool_path: str):
+    """
+    Return the upload content when it fits in `max_memory` bytes,
+    otherwise spool it to `spool_path` chunk by chunk and return the path.
+    Containers ffmpeg can only decode from a file are always spooled.
+    """
+    if needs_seeking(file):
+        await spool_upload(file, spool_path)
+        return spool_path
+    buffer = bytearray()
+    while chunk := await file.read(CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) > max_memory:
+            log.debug(f"Upload {file.filename} over {max_memory} bytes, spooling to disk")
+            async with aiofiles.open(spool_path, "wb") as out_file:
+                await out_file.write(buffer)
+                buffer.clear()
+                while chunk := await file.read(CHUNK_SIZE):
+                    await out_file.write(chunk)
+            return spool_path
+    return bytes(buffer)
+
+
+def load_audio(source, sample_rate: int = WHISPER_SAMPLE_RATE):
+    """
+    Decode a file path or in memory content to the mono float32 samples whisper expects,
+    in memory content being piped to ffmpeg, or decoded from a temporary file when
+    its container can not be read from a pipe.
+    """
+    if isinstance(source, str):
+        return decode_audio(source, sample_rate)
+    try:
+        return decode_audio(source, sample_rate)
+    except RuntimeError as e:
+        log.debug(f"Failed decoding audio from memory, retrying from a file: {e}")
+    with tempfile.NamedTemporaryFile() as temp_file:
+        temp_file.write(source)
+        temp_file.flush()
+        return decode_audio(temp_file.name, sample_rate)
+
+
+def decode_audio(source, sample_rate: int = WHISPER_SAMPLE_RATE):
+    is_path = isinstance(source, str)
+    command = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads",
+        "0",
+        "-i",
+        source if is_path else "pipe:0",
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        str(sample_rate),
+        "-",
+    ]
+    try:
+        output = subprocess.run(
+            command, input=None if is_path else source, capture_output=True, check=True
+        ).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
+    return np.frombuffer(output, np.int16).flatten().astype(np.float32) / 32768.0